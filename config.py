@@ -1,31 +1,54 @@
 # config.py
+import functools
 import os
-from pathlib import Path
-
-# Base paths
-BASE_DIR = Path(__file__).parent
-SAVE_FOLDER = BASE_DIR / "keg_frames"
-DB_PATH = BASE_DIR / "keg_detection.db"
-MODELS_DIR = BASE_DIR / "models"
-LOGS_DIR = BASE_DIR / "logs"
-BATCH_MEMORY_FILE = BASE_DIR / "last_batch.txt"
-
-# Create directories
-SAVE_FOLDER.mkdir(exist_ok=True)
-MODELS_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
+import random
+import sys
+import numpy as np
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+from urllib.parse import urljoin
+
+# Base paths (plain strings; wrap in Path only where an API needs one)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAVE_FOLDER = os.path.join(BASE_DIR, "keg_frames")
+DB_PATH = os.path.join(BASE_DIR, "keg_detection.db")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+LOGS_DIR = os.path.join(BASE_DIR, "logs")
+BATCH_MEMORY_FILE = os.path.join(BASE_DIR, "last_batch.txt")
+CLOUD_CONFIG_CACHE_FILE = os.path.join(BASE_DIR, "cloud_config.cache.json")
+
+# Create directories (one stat per directory per process)
+_DIR_CACHE = set()
+for _dir in (SAVE_FOLDER, MODELS_DIR, LOGS_DIR):
+    if _dir not in _DIR_CACHE:
+        if not os.path.isdir(_dir):
+            os.makedirs(_dir, exist_ok=True)
+        _DIR_CACHE.add(_dir)
 
 # Camera Configuration for Real-Time
-CAMERA_CONFIG = {
-    'type': 'v4l2',
-    'device': 10,  # /dev/video10
-    'width': 1920,
-    'height': 1080,
-    'fps': 30,
-}
-
-# Keg Types and Pallet Configuration
-KEG_TYPES = {
+class CameraConfig(NamedTuple):
+    type: str = 'v4l2'
+    device: int = 0
+    width: int = 1920
+    height: int = 1080
+    fps: int = 30
+    rtsp_url: Optional[str] = None
+    sensor_id: int = 0
+    file_path: str = 'sample.mp4'
+
+CAMERA_CONFIG = CameraConfig(
+    type='v4l2',
+    device=10,  # /dev/video10
+    width=1920,
+    height=1080,
+    fps=30,
+)
+
+# Keg Types and Pallet Configuration (read-only views, frozen at import;
+# keys are interned so lookups with the same constants compare by identity)
+KEG_TYPES = MappingProxyType({
+    sys.intern(k): MappingProxyType({sys.intern(p): n for p, n in v.items()})
+    for k, v in {
     "30L": {
         "EUR Pallet": 6,
         "Industrial Pallet": 8
@@ -38,14 +61,19 @@ KEG_TYPES = {
         "EUR Pallet": 6,
         "Industrial Pallet": 8
     }
-}
+}.items()})
+
+@functools.cache
+def pallet_capacity(keg_type: str, pallet_type: str) -> int:
+    """Validated capacity lookup; unknown keg types use the 'Other' row"""
+    return KEG_TYPES.get(keg_type, KEG_TYPES["Other"])[pallet_type]
 
 # Pallet types
-PALLET_TYPES = ["EUR Pallet", "Industrial Pallet"]
+PALLET_TYPES = (sys.intern("EUR Pallet"), sys.intern("Industrial Pallet"))
 
 # Default settings
-DEFAULT_KEG_TYPE = "30L"
-DEFAULT_PALLET_TYPE = "EUR Pallet"
+DEFAULT_KEG_TYPE = sys.intern("30L")
+DEFAULT_PALLET_TYPE = sys.intern("EUR Pallet")
 DEFAULT_KEG_COUNT = 6  # Changed from expression to fixed value for utils.save_default_keg_count()
 MAX_KEG_COUNT = 20
 MIN_KEG_COUNT = 1
@@ -62,9 +90,14 @@ CAMERA_MAC_ID = "3C:6D:66:01:5A:F0"
 CAMERA_SERIAL = "icam-540"
 
 # API Configuration
-API_ENDPOINT = "http://143.110.186.93:5001/api/kegs/fillingareaupdatecamera"
-BEER_TYPES_ENDPOINT = "http://143.110.186.93:5001/api/kegs/cam/beer-types"
+API_BASE_URL = "http://143.110.186.93:5001"
+API_ENDPOINT = urljoin(API_BASE_URL, "/api/kegs/fillingareaupdatecamera")
+BEER_TYPES_ENDPOINT = urljoin(API_BASE_URL, "/api/kegs/cam/beer-types")
 API_TIMEOUT = 10
+API_CONNECT_TIMEOUT = 3  # TCP connect timeout; API_TIMEOUT bounds the read
+NETWORK_PROBE_TIMEOUT = 1.0  # TCP connect probe used for the ONLINE/OFFLINE indicator
+NETWORK_PROBE_INTERVAL = 30
+DNS_CACHE_TTL = 300  # seconds a resolved API host address is reused by the probe
 API_MAX_RETRIES = 3
 
 # Add SSL bypass for development
@@ -74,37 +107,66 @@ SSL_VERIFY = False  # Set to True in production
 ENABLE_PAYLOAD_HASH = True
 
 # Cloud sync settings
-CLOUD_CONFIG_ENDPOINT = f"{API_ENDPOINT}/api/current-config"
 CLOUD_SYNC_INTERVAL = 30
+CLOUD_CONFIG_CACHE_TTL = 30  # seconds a cached cloud config is served without refreshing
 
 # Model Configuration
-KEG_MODEL_PATH = MODELS_DIR / "best.pt"
-QR_MODEL_PATH = MODELS_DIR / "model_qr" / "best.pt"
 KEG_CONF_THRESHOLD = 0.1
 QR_CONF_THRESHOLD = 0.4
 
+# Live detection pacing (preview always renders; keg detection is skipped/downscaled)
+DETECT_EVERY = 2  # Run keg detection on every Nth preview frame
+DETECT_EVERY_MAX = 6
+DETECT_BUDGET_SECONDS = 0.040  # Back off when one detection takes longer than this
+DETECT_SCALE = 0.5
+PREVIEW_SCALE = 0.5  # Preview texture size relative to CAMERA_CONFIG
+CPU_PINNING = True  # Pin UI / detector / background threads to separate cores (Linux, 3+ cores)
+UI_FPS = 20  # Preview / update_frame rate while kegs or QR codes are in view
+IDLE_UI_FPS = 2  # Rate when the camera is off or nothing was seen for IDLE_AFTER_SECONDS
+IDLE_AFTER_SECONDS = 30
+
 # Advanced QR Detection
 TILE_SIZE = (1280, 960)
+TILE_BATCH_SIZE = 8  # Tiles per YOLO forward pass
 OVERLAP_RATIO = 0.2
-SCALE_FACTORS = [1.0, 1.2, 1.5]
+SCALE_FACTORS = np.array([1.0, 1.2, 1.5], dtype=np.float32)
 MIN_CROP_SIZE = 50
 MIN_UPSCALE_SIZE = 100
 
 # Retry Configuration
 RETRY_MAX_ATTEMPTS = 3
-RETRY_BACKOFF_MINUTES = [1, 2, 4, 8, 16]
+RETRY_BACKOFF_SECONDS = (60, 120, 240, 480, 960)  # 1, 2, 4, 8, 16 minutes
+RETRY_JITTER_RATIO = 0.1  # up to +10% random spread so devices don't retry in lockstep
 RETRY_CHECK_INTERVAL = 60
 NETWORK_CHECK_INTERVAL = 30
 
+def retry_backoff(attempt: int) -> float:
+    """Jittered delay in seconds before 0-based retry attempt (capped at the last step)"""
+    delay = RETRY_BACKOFF_SECONDS[min(attempt, len(RETRY_BACKOFF_SECONDS) - 1)]
+    return delay + random.uniform(0, delay * RETRY_JITTER_RATIO)
+
+# Cloud config sync: short in-call retries, then a circuit breaker between syncs
+SYNC_RETRY_ATTEMPTS = 3
+SYNC_RETRY_BASE_SECONDS = 1.0  # 1, 2, 4 s ... capped at SYNC_RETRY_MAX_SECONDS
+SYNC_RETRY_MAX_SECONDS = 30
+SYNC_CIRCUIT_THRESHOLD = 5  # consecutive failed syncs before pausing
+SYNC_CIRCUIT_OPEN_SECONDS = 60
+
+def sync_backoff(attempt: int) -> float:
+    """Jittered (+/-RETRY_JITTER_RATIO) delay in seconds before 0-based sync retry"""
+    delay = min(SYNC_RETRY_BASE_SECONDS * (2 ** attempt), SYNC_RETRY_MAX_SECONDS)
+    return delay * (1 + random.uniform(-RETRY_JITTER_RATIO, RETRY_JITTER_RATIO))
+
 # Alarm System Configuration
 ALARM_BLINK_INTERVAL = 0.5
 ENABLE_PHYSICAL_ALERTS = False
 
 # Application Settings
 MAX_FOLDER_SIZE_MB = 500
+DEBUG = os.environ.get('PALLET_DEBUG') == '1'  # Capture/status tracing on stdout
 
 # Color Scheme for HMI
-COLOR_SCHEME = {
+COLOR_SCHEME = MappingProxyType({
     'bg_light': (1, 1, 1, 1),
     'panel_bg': (0.95, 0.95, 0.95, 1),
     'highlight': (0, 0.3, 0.6, 1),
@@ -112,4 +174,19 @@ COLOR_SCHEME = {
     'alert_red': (0.8, 0.2, 0.2, 1),
     'status_green': (0.2, 0.7, 0.3, 1),
     'status_orange': (0.9, 0.6, 0.2, 1)
-}
\ No newline at end of file
+})
+
+# Lazily materialized settings (PEP 562): only the detector and cloud sync
+# need these, so they are built on first access and cached in globals().
+_LAZY = {
+    'KEG_MODEL_PATH': lambda: os.path.join(MODELS_DIR, "best.pt"),
+    'QR_MODEL_PATH': lambda: os.path.join(MODELS_DIR, "model_qr", "best.pt"),
+    'CLOUD_CONFIG_ENDPOINT': lambda: urljoin(API_BASE_URL, "/api/current-config"),
+}
+
+def __getattr__(name):
+    factory = _LAZY.get(name)
+    if factory is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = factory()
+    return value
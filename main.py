@@ -1,16 +1,23 @@
 #!/usr/bin/env python3
 import os
+import re
+import functools
 import sys
+import array
+import asyncio
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import cv2
 import numpy as np
 import json
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import queue
+import socket
 import time
-from datetime import datetime
-import requests
+import traceback
 import uuid
+import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
 import sqlite3
 
 # Kivy Imports
@@ -25,9 +32,11 @@ from kivy.uix.progressbar import ProgressBar
 from kivy.uix.image import Image
 from kivy.uix.spinner import Spinner
 from kivy.uix.textinput import TextInput
-from kivy.uix.scrollview import ScrollView
 from kivy.uix.modalview import ModalView
-from kivy.clock import Clock
+from kivy.uix.popup import Popup
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.clock import Clock, mainthread
 from kivy.core.window import Window
 from kivy.graphics import Color, Rectangle, Line
 from kivy.graphics.texture import Texture
@@ -36,20 +45,37 @@ import logging
 # Custom Modules
 from modules.camera import CameraManager
 from modules.detector import KegDetector, QRDetector
+from modules.fast_preproc import preprocess
 from modules.database import DatabaseManager
 from modules.api_sender import APISender
 from modules.process_worker import submit_batch
-from modules.utils import setup_logging, create_timestamp, save_last_batch, load_last_batch
+from modules.utils import (
+    setup_logging, create_timestamp, fmt_now, save_last_batch, load_last_batch,
+    save_cloud_config, load_cloud_config, plan_cpu_affinity, pin_current_thread
+)
 from config import (
-    CAMERA_CONFIG, DEFAULT_KEG_COUNT, MAX_KEG_COUNT, KEG_TYPES, SAVE_FOLDER,
+    CAMERA_CONFIG, DEFAULT_KEG_COUNT, MAX_KEG_COUNT, SAVE_FOLDER,
+    DEFAULT_KEG_TYPE, DEFAULT_PALLET_TYPE, pallet_capacity,
     MIN_KEG_COUNT, STABILITY_THRESHOLD, COLOR_SCHEME,
+    DETECT_EVERY, DETECT_EVERY_MAX, DETECT_BUDGET_SECONDS, DETECT_SCALE, PREVIEW_SCALE,
+    CPU_PINNING, DEBUG, UI_FPS, IDLE_UI_FPS, IDLE_AFTER_SECONDS,
     FOV_ENABLED, FOV_BOUNDARY_RATIO,
-    CLOUD_CONFIG_ENDPOINT, CLOUD_SYNC_INTERVAL, CAMERA_MAC_ID
+    CLOUD_CONFIG_ENDPOINT, CLOUD_SYNC_INTERVAL, API_CONNECT_TIMEOUT, API_BASE_URL,
+    NETWORK_PROBE_TIMEOUT, NETWORK_PROBE_INTERVAL, DNS_CACHE_TTL,
+    SYNC_RETRY_ATTEMPTS, SYNC_CIRCUIT_THRESHOLD, SYNC_CIRCUIT_OPEN_SECONDS, sync_backoff, CLOUD_CONFIG_CACHE_TTL, CAMERA_MAC_ID
 )
 
 # Setup logging
 logger = setup_logging()
 
+# Keep-alive session for cloud config sync. Retries live in _sync_async, so the
+# adapter does none of its own (APISender's session retries 3x per call).
+_SYNC_SESSION = requests.Session()
+_SYNC_SESSION.verify = False
+_SYNC_ADAPTER = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=0)
+_SYNC_SESSION.mount("http://", _SYNC_ADAPTER)
+_SYNC_SESSION.mount("https://", _SYNC_ADAPTER)
+
 # Color Constants
 COLOR_BG_DARK = (0.1, 0.1, 0.1, 1)
 COLOR_PANEL_BG = (0.15, 0.15, 0.15, 1)
@@ -61,10 +87,62 @@ COLOR_STATUS_ORANGE = (1, 0.6, 0, 1)
 COLOR_STATUS_BLUE = (0.2, 0.5, 0.8, 1)
 COLOR_BUTTON_NORMAL = (0.3, 0.3, 0.3, 1)
 
+# Capture tracing goes to stdout only with PALLET_DEBUG=1
+debug_print = print if DEBUG else (lambda *args, **kwargs: None)
+
+# Workflow log levels (stored as uint8 codes)
+LOG_INFO, LOG_ERROR = 0, 1
+
+# Batch number format, e.g. BATCH-001 (compiled once, matched per confirm)
+_BATCH_RE = re.compile(r'^BATCH-(\d+)$')
+_TRAILING_DIGITS_RE = re.compile(r'(\d+)$')
+
+@functools.lru_cache(maxsize=32)
 def hex_color(rgb_tuple):
-    """Convert RGB tuple to hex color string"""
+    """Convert RGB tuple to hex color string (cached: callers pass a few fixed tuples)"""
     return f'#{int(rgb_tuple[0]*255):02x}{int(rgb_tuple[1]*255):02x}{int(rgb_tuple[2]*255):02x}{int(rgb_tuple[3]*255):02x}'
 
+# Hex strings for the fixed palette, computed once at import
+HEX = {name[len('COLOR_'):]: hex_color(value) for name, value in (
+    ('COLOR_BG_DARK', COLOR_BG_DARK),
+    ('COLOR_PANEL_BG', COLOR_PANEL_BG),
+    ('COLOR_HIGHLIGHT', COLOR_HIGHLIGHT),
+    ('COLOR_TEXT_LIGHT', COLOR_TEXT_LIGHT),
+    ('COLOR_ALERT_RED', COLOR_ALERT_RED),
+    ('COLOR_STATUS_GREEN', COLOR_STATUS_GREEN),
+    ('COLOR_STATUS_ORANGE', COLOR_STATUS_ORANGE),
+    ('COLOR_STATUS_BLUE', COLOR_STATUS_BLUE),
+    ('COLOR_BUTTON_NORMAL', COLOR_BUTTON_NORMAL),
+)}
+
+# QR overlay style (BGR colors, label font)
+QR_BOX_COLOR = (0, 255, 0)
+QR_TEXT_COLOR = (0, 0, 0)
+QR_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+@functools.lru_cache(maxsize=256)
+def _text_size(label):
+    """Pixel size of a QR overlay label (cached: the same kegs stay in view)"""
+    return cv2.getTextSize(label, QR_FONT, 0.5, 1)[0]
+
+def _put_latest(q, item):
+    """Put item on a size-1 queue, replacing whatever the consumer has not taken yet"""
+    try:
+        q.get_nowait()
+    except queue.Empty:
+        pass
+    q.put_nowait(item)
+
+def _beer_entry(item):
+    """(name, id) for one beer type item - dict from the cloud or a plain string"""
+    if isinstance(item, dict):
+        name = item.get('name', 'Unknown')
+        # Cloud uses _id, fallback to id, then name
+        return name, item.get('_id', item.get('id', name))
+    # Fallback for strings
+    name = str(item)
+    return name, name
+
 class ToastMessage(ModalView):
     """Toast-like popup for brief user messages"""
     def __init__(self, message, msg_type="info", duration=3, **kwargs):
@@ -89,8 +167,8 @@ class ToastMessage(ModalView):
         with container.canvas.before:
             Color(*bg_color)
             self.rect = Rectangle(pos=container.pos, size=container.size)
-        container.bind(pos=lambda *x: setattr(self.rect, 'pos', container.pos))
-        container.bind(size=lambda *x: setattr(self.rect, 'size', container.size))
+        # Bound methods receive the new value directly (no closure re-reading container)
+        container.bind(pos=self._update_rect_pos, size=self._update_rect_size)
         
         label = Label(
             text=message,
@@ -103,6 +181,12 @@ class ToastMessage(ModalView):
         
         # Auto-dismiss after duration
         Clock.schedule_once(lambda dt: self.dismiss(), duration)
+    
+    def _update_rect_pos(self, instance, value):
+        self.rect.pos = value
+    
+    def _update_rect_size(self, instance, value):
+        self.rect.size = value
 
 
 class ConfirmationModal(ModalView):
@@ -110,7 +194,7 @@ class ConfirmationModal(ModalView):
     def __init__(self, title, message, on_confirm, on_cancel=None, **kwargs):
         super().__init__(**kwargs)
         self.size_hint = (0.6, 0.35)
-        self.background_color = hex_color((0, 0, 0, 0.9))
+        self.background_color = (0, 0, 0, 0.9)
         self.on_confirm_callback = on_confirm
         self.on_cancel_callback = on_cancel
         self.auto_dismiss = False
@@ -124,7 +208,7 @@ class ConfirmationModal(ModalView):
             height=30,
             font_size='18sp',
             bold=True,
-            color=hex_color(COLOR_HIGHLIGHT)
+            color=HEX['HIGHLIGHT']
         )
         
         # Message
@@ -133,7 +217,7 @@ class ConfirmationModal(ModalView):
             size_hint_y=None,
             height=60,
             font_size='14sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='center',
             text_size=(380, None)
         )
@@ -144,7 +228,7 @@ class ConfirmationModal(ModalView):
         cancel_btn = Button(
             text='CANCEL',
             font_size='14sp',
-            background_color=hex_color((0.4, 0.4, 0.4, 1)),
+            background_color=(0.4, 0.4, 0.4, 1),
             background_normal='',
             on_press=self.cancel
         )
@@ -153,7 +237,7 @@ class ConfirmationModal(ModalView):
             text='CONFIRM',
             font_size='14sp',
             bold=True,
-            background_color=hex_color(COLOR_STATUS_GREEN),
+            background_color=HEX['STATUS_GREEN'],
             background_normal='',
             on_press=self.confirm
         )
@@ -182,7 +266,7 @@ class CountModal(ModalView):
     def __init__(self, on_confirm, current_count, **kwargs):
         super().__init__(**kwargs)
         self.size_hint = (0.5, 0.45)
-        self.background_color = hex_color((0, 0, 0, 0.85))
+        self.background_color = (0, 0, 0, 0.85)
         self.on_confirm = on_confirm
         
         layout = BoxLayout(orientation='vertical', padding=20, spacing=10)
@@ -194,7 +278,7 @@ class CountModal(ModalView):
             height=40,
             font_size='18sp',
             bold=True,
-            color=hex_color(COLOR_HIGHLIGHT)
+            color=HEX['HIGHLIGHT']
         )
         
         # Input field
@@ -204,9 +288,9 @@ class CountModal(ModalView):
             multiline=False,
             font_size='20sp',
             halign='center',
-            background_color=hex_color((0.2, 0.2, 0.2, 1)),
-            foreground_color=hex_color(COLOR_TEXT_LIGHT),
-            cursor_color=hex_color(COLOR_HIGHLIGHT),
+            background_color=(0.2, 0.2, 0.2, 1),
+            foreground_color=HEX['TEXT_LIGHT'],
+            cursor_color=HEX['HIGHLIGHT'],
             size_hint_x=0.7
         )
         
@@ -238,14 +322,14 @@ class CountModal(ModalView):
         plus_btn = Button(
             text='+',
             font_size='20sp',
-            background_color=hex_color(COLOR_STATUS_GREEN),
+            background_color=HEX['STATUS_GREEN'],
             on_press=increment
         )
         
         minus_btn = Button(
             text='−',
             font_size='20sp',
-            background_color=hex_color(COLOR_ALERT_RED),
+            background_color=HEX['ALERT_RED'],
             on_press=decrement
         )
         
@@ -261,19 +345,19 @@ class CountModal(ModalView):
             size_hint_y=None,
             height=25,
             font_size='12sp',
-            color=hex_color(COLOR_ALERT_RED)
+            color=HEX['ALERT_RED']
         )
         
         # Action buttons
         btn_layout = BoxLayout(size_hint_y=None, height=40, spacing=10)
         cancel_btn = Button(
             text='Cancel',
-            background_color=hex_color((0.4, 0.4, 0.4, 1)),
+            background_color=(0.4, 0.4, 0.4, 1),
             on_press=lambda x: self.dismiss()
         )
         ok_btn = Button(
             text='Set Count',
-            background_color=hex_color(COLOR_HIGHLIGHT),
+            background_color=HEX['HIGHLIGHT'],
             on_press=self.confirm
         )
         
@@ -312,7 +396,7 @@ class BatchModal(ModalView):
     def __init__(self, on_confirm, current_batch, **kwargs):
         super().__init__(**kwargs)
         self.size_hint = (0.6, 0.55)
-        self.background_color = hex_color((0, 0, 0, 0.85))
+        self.background_color = (0, 0, 0, 0.85)
         self.on_confirm = on_confirm
         
         layout = BoxLayout(orientation='vertical', padding=20, spacing=12)
@@ -324,7 +408,7 @@ class BatchModal(ModalView):
             height=30,
             font_size='18sp',
             bold=True,
-            color=hex_color(COLOR_HIGHLIGHT)
+            color=HEX['HIGHLIGHT']
         )
         
         # Batch Input
@@ -335,9 +419,9 @@ class BatchModal(ModalView):
             font_size='18sp',
             halign='center',
             write_tab=False,
-            background_color=hex_color((0.2, 0.2, 0.2, 1)),
-            foreground_color=hex_color(COLOR_TEXT_LIGHT),
-            cursor_color=hex_color(COLOR_HIGHLIGHT),
+            background_color=(0.2, 0.2, 0.2, 1),
+            foreground_color=HEX['TEXT_LIGHT'],
+            cursor_color=HEX['HIGHLIGHT'],
             size_hint_y=None,
             height=40
         )
@@ -348,7 +432,7 @@ class BatchModal(ModalView):
             size_hint_y=None,
             height=20,
             font_size='11sp',
-            color=hex_color(COLOR_STATUS_BLUE),
+            color=HEX['STATUS_BLUE'],
             halign='center'
         )
         
@@ -358,21 +442,21 @@ class BatchModal(ModalView):
             size_hint_y=None,
             height=25,
             font_size='12sp',
-            color=hex_color(COLOR_ALERT_RED)
+            color=HEX['ALERT_RED']
         )
         
         # Action buttons
         btn_layout = BoxLayout(size_hint_y=None, height=40, spacing=10)
         cancel_btn = Button(
             text='Cancel',
-            background_color=hex_color((0.4, 0.4, 0.4, 1)),
+            background_color=(0.4, 0.4, 0.4, 1),
             on_press=lambda x: self.dismiss()
         )
         ok_btn = Button(
             text='SET BATCH',
             font_size='14sp',
             bold=True,
-            background_color=hex_color(COLOR_HIGHLIGHT),
+            background_color=HEX['HIGHLIGHT'],
             on_press=self.confirm
         )
         
@@ -395,7 +479,6 @@ class BatchModal(ModalView):
         self.error_label.text = ''
     
     def confirm(self, instance):
-        import re
         self.clear_error()
         batch = self.input_field.text.strip()
         
@@ -403,20 +486,18 @@ class BatchModal(ModalView):
             self.show_error("Batch number is required!")
             return
         
-        # Check for lowercase letters - reject them
-        if batch != batch.upper():
-            self.show_error("Use UPPERCASE only! (e.g., BATCH-001)")
-            return
-        
-        # Validate format: BATCH-XXX where XXX is only numbers
-        pattern = r'^BATCH-\d+$'
-        if not re.match(pattern, batch):
-            self.show_error("Invalid format! Use BATCH-XXX (numbers only)")
+        # Validate format: BATCH-XXX where XXX is only numbers (uppercase only)
+        match = _BATCH_RE.match(batch)
+        if not match:
+            if _BATCH_RE.match(batch.upper()):
+                self.show_error("Use UPPERCASE only! (e.g., BATCH-001)")
+            else:
+                self.show_error("Invalid format! Use BATCH-XXX (numbers only)")
             return
         
-        # Extract the number part and validate it's not empty
-        number_part = batch.replace('BATCH-', '')
-        if not number_part or int(number_part) <= 0:
+        # Validate the number part captured by the regex
+        number_part = match.group(1)
+        if int(number_part) <= 0:
             self.show_error("Enter a valid batch number (e.g., BATCH-001)")
             return
         
@@ -439,13 +520,49 @@ class SimpleKegHMI(BoxLayout):
         self.keg_detector = KegDetector()
         self.qr_detector = QRDetector()
         
-        # Async Detection Setup
-        self.detector_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LiveDetector")
-        self.current_detection_task = None
+        # CPU pinning: UI, live detector and background work on separate cores
+        cpu_plan = plan_cpu_affinity() if CPU_PINNING else None
+        ui_cores, detect_cores, self._background_cores = cpu_plan or (None, None, None)
+        if ui_cores:
+            cv2.setNumThreads(1)  # Keep OpenCV from fanning out over the UI core
+        
+        # Async Setup - one background event loop for network I/O
+        self._aio_loop = asyncio.new_event_loop()
+        self._aio_thread = threading.Thread(target=self._run_aio_loop, name="AsyncLoop", daemon=True)
+        self._aio_thread.start()
+        
+        # Live QR detector: one thread fed by a size-1 queue (latest frame wins)
+        self._det_q = queue.Queue(maxsize=1)
+        self._det_thread = threading.Thread(
+            target=self._detect_loop, args=(detect_cores,), name="LiveDetector", daemon=True
+        )
+        self._det_thread.start()
+        # Keg detector: same latest-frame handoff, results come back via _on_keg_result
+        self._keg_q = queue.Queue(maxsize=1)
+        threading.Thread(
+            target=self._keg_loop, args=(detect_cores,), name="KegDetector", daemon=True
+        ).start()
+        pin_current_thread(ui_cores)
+        
+        # Capture writer: frames are saved and handed to submit_batch off the UI thread
+        self._save_q = queue.Queue(maxsize=16)
+        threading.Thread(target=self._save_worker, name="CaptureWriter", daemon=True).start()
         self.latest_qr_results = []
+        # Per-frame counts, computed once in _on_keg_result and read by update_display
+        self.qr_count = 0
+        self.effective_count = 0
+        
+        # Keg detection pacing (adaptive frame skipping)
+        self._frame_counter = 0
+        self._detect_every = DETECT_EVERY
         
         # Track last captured QR codes to detect same kegs
-        self.last_captured_qr_set = set()
+        self.last_captured_qr_set = frozenset()
+        self._last_captured_qr_fp = None
+        
+        # Fingerprint of the latest QR strings; the set is rebuilt only when it changes
+        self._latest_qr_fp = 0
+        self._latest_qr_set = frozenset()
         
         # System state
         self.detection_active = False
@@ -455,15 +572,35 @@ class SimpleKegHMI(BoxLayout):
         self.stability_counter = 0
         self.is_auto_mode = False  # Start with manual mode by default
         self.processing = False
+        # Inputs of the last update_display; unchanged means nothing to redraw
+        self._last_display_state = None
         self.beer_types = ["Loading..."]  # Wait for API
         self.beer_type_map = {} # Mapping name -> id
+        
+        # Cloud sync circuit breaker (monotonic deadline)
+        self._sync_failure_count = 0
+        self._sync_circuit_open_until = 0.0
+        # MAC sent with every sync; fall back to this machine's when unset or the placeholder
+        mac_address = CAMERA_MAC_ID
+        if not mac_address or mac_address == "3C:6D:66:01:5A:F0":
+            # Get actual MAC address
+            mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff) 
+                           for elements in range(0, 2*6, 2)][::-1])
+            mac_address = mac.upper()
+        self._mac_address = mac_address
+        self.selected_beer_id = None
 
 
         # Load last batch number
         self.last_batch_number = load_last_batch()
         
         # Logs
-        self.workflow_logs = []
+        # Column-wise: timestamps, level codes and messages in parallel arrays
+        self._log_lock = threading.Lock()
+        self._log_ts = array.array('d')
+        self._log_lvl = array.array('B')
+        self._log_msg = []
+        self._logs_popup = None  # Built on first show_logs
         
         # Build UI
         self.build_ui()
@@ -472,9 +609,19 @@ class SimpleKegHMI(BoxLayout):
         self.start_detection_system()
         
         # Schedule tasks
-        Clock.schedule_interval(self.update_frame, 1.0 / 20.0)  # Reduced for performance
-        Clock.schedule_interval(self.check_network, 30)
-        Clock.schedule_interval(self.update_filling_date, 60)  # Update filling date every minute
+        # update_frame drops to IDLE_UI_FPS while there is nothing to look at
+        self._frame_fps = UI_FPS
+        self._frame_event = Clock.schedule_interval(self.update_frame, 1.0 / UI_FPS)
+        self._last_activity = time.monotonic()
+        # Filling date and network status tick on the background loop, not the UI clock
+        self._last_filling_date = None
+        self._last_online = None
+        api = urlsplit(API_BASE_URL)
+        self._probe_host = api.hostname
+        self._probe_port = api.port or (443 if api.scheme == 'https' else 80)
+        self._dns_cache = {}  # host -> (address, resolved_at monotonic)
+        self._aio_loop.call_soon_threadsafe(self.update_filling_date)
+        self.run_async(self.check_network())
         Clock.schedule_once(self.recover_batches, 1)
         Clock.schedule_once(lambda dt: self.sync_cloud(), 2)
         Clock.schedule_once(self.fetch_beer_types, 3)
@@ -489,7 +636,7 @@ class SimpleKegHMI(BoxLayout):
             text='[b]KEG COUNTING SYSTEM[/b]',
             markup=True,
             font_size='20sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         
@@ -497,7 +644,7 @@ class SimpleKegHMI(BoxLayout):
             text='[b]● READY[/b]',
             markup=True,
             font_size='14sp',
-            color=hex_color(COLOR_STATUS_GREEN),
+            color=HEX['STATUS_GREEN'],
             halign='right'
         )
         
@@ -514,10 +661,12 @@ class SimpleKegHMI(BoxLayout):
         cam_container = BoxLayout(padding=2)
         with cam_container.canvas.before:
             Color(*COLOR_BG_DARK)
-            Rectangle(pos=cam_container.pos, size=cam_container.size)
+            self._cam_bg = Rectangle(pos=cam_container.pos, size=cam_container.size)
             Color(0.3, 0.3, 0.3, 1)
-            Line(rectangle=(cam_container.pos[0], cam_container.pos[1], 
+            self._cam_border = Line(rectangle=(cam_container.pos[0], cam_container.pos[1], 
                           cam_container.size[0], cam_container.size[1]), width=1.5)
+        # Keep background/border on the container as it is laid out
+        cam_container.bind(pos=self._update_cam_frame, size=self._update_cam_frame)
         
         # Fix deprecated properties
         self.preview_image = Image()
@@ -525,6 +674,10 @@ class SimpleKegHMI(BoxLayout):
         cam_container.add_widget(self.preview_image)
         left_panel.add_widget(cam_container)
         
+        # Persistent preview texture + buffer (blitted in place every frame)
+        self._build_preview_renderer(CAMERA_CONFIG.width, CAMERA_CONFIG.height)
+        self._placeholder_tex = None
+        
         # Detection status below camera
         status_box = GridLayout(cols=2, rows=1, spacing=5, size_hint_y=None, height=40)
         
@@ -532,14 +685,14 @@ class SimpleKegHMI(BoxLayout):
         target_label = Label(
             text='TARGET COUNT:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         self.target_display = Label(
             text=str(self.required_keg_count),
             font_size='24sp',
             bold=True,
-            color=hex_color(COLOR_HIGHLIGHT),
+            color=HEX['HIGHLIGHT'],
             halign='right'
         )
         
@@ -571,7 +724,7 @@ class SimpleKegHMI(BoxLayout):
         mode_label = Label(
             #text='OPERATION MODE:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             size_hint_y=None,
             height=20
         )
@@ -583,7 +736,7 @@ class SimpleKegHMI(BoxLayout):
             state='normal',
             font_size='14sp',
             background_normal='',
-            background_color=hex_color(COLOR_BUTTON_NORMAL)
+            background_color=HEX['BUTTON_NORMAL']
         )
         self.auto_btn.bind(on_press=self.set_auto_mode)
         
@@ -593,7 +746,7 @@ class SimpleKegHMI(BoxLayout):
             state='down',
             font_size='14sp',
             background_normal='',
-            background_color=hex_color(COLOR_HIGHLIGHT)
+            background_color=HEX['HIGHLIGHT']
         )
         self.manual_btn.bind(on_press=self.set_manual_mode)
         
@@ -611,20 +764,20 @@ class SimpleKegHMI(BoxLayout):
         beer_label = Label(
             text='BEER TYPE:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         self.beer_display = Spinner(
             text='Loading...',
             values=[],
             font_size='14sp',
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal='',
             option_cls=lambda **kwargs: Button(
                 **kwargs, 
                 size_hint_y=None, 
                 height=40, 
-                background_color=hex_color(COLOR_PANEL_BG),
+                background_color=HEX['PANEL_BG'],
                 background_normal=''
             )
         )
@@ -634,13 +787,13 @@ class SimpleKegHMI(BoxLayout):
         count_label = Label(
             text='TARGET COUNT:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         self.count_button = Button(
             text=str(self.required_keg_count),
             font_size='14sp',
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal='',
             on_press=self.change_count
         )
@@ -649,13 +802,13 @@ class SimpleKegHMI(BoxLayout):
         batch_label = Label(
             text='BATCH NO:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         self.batch_display = Button(
             text=self.last_batch_number,
             font_size='14sp',
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal='',
             on_press=self.edit_batch
         )
@@ -671,13 +824,13 @@ class SimpleKegHMI(BoxLayout):
         filling_label = Label(
             text='FILLING DATE:',
             font_size='12sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             halign='left'
         )
         self.filling_date_display = Button(
-            text=datetime.now().strftime('%d-%m-%Y %H:%M'),
+            text=fmt_now(),
             font_size='14sp',
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal=''
         )
         config_box.add_widget(filling_label)
@@ -692,7 +845,7 @@ class SimpleKegHMI(BoxLayout):
             text='',
             font_size='14sp',
             bold=True,
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             size_hint_y=None,
             height=30
         )
@@ -701,7 +854,7 @@ class SimpleKegHMI(BoxLayout):
         self.duplicate_warning = Label(
             text='',
             font_size='12sp',
-            color=hex_color(COLOR_STATUS_ORANGE),
+            color=HEX['STATUS_ORANGE'],
             size_hint_y=None,
             height=20
         )
@@ -723,7 +876,7 @@ class SimpleKegHMI(BoxLayout):
             text='',
             font_size='13sp',
             bold=True,
-            color=hex_color(COLOR_STATUS_GREEN),
+            color=HEX['STATUS_GREEN'],
             size_hint_y=None,
             height=22,
             halign='center',
@@ -735,7 +888,7 @@ class SimpleKegHMI(BoxLayout):
             text='',
             font_size='14sp',
             bold=True,
-            color=hex_color(COLOR_HIGHLIGHT),
+            color=HEX['HIGHLIGHT'],
             size_hint_y=None,
             height=28,
             halign='center',
@@ -746,7 +899,7 @@ class SimpleKegHMI(BoxLayout):
         self.batch_info_label = Label(
             text='',
             font_size='11sp',
-            color=hex_color(COLOR_TEXT_LIGHT),
+            color=HEX['TEXT_LIGHT'],
             size_hint_y=None,
             height=18,
             halign='center',
@@ -772,7 +925,7 @@ class SimpleKegHMI(BoxLayout):
         sync_btn = Button(
             text='SYNC',
             font_size='12sp',
-            background_color=hex_color(COLOR_STATUS_BLUE),
+            background_color=HEX['STATUS_BLUE'],
             background_normal='',
             on_press=lambda x: self.sync_cloud()
         )
@@ -780,7 +933,7 @@ class SimpleKegHMI(BoxLayout):
         logs_btn = Button(
             text='LOGS',
             font_size='12sp',
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal='',
             on_press=self.show_logs
         )
@@ -789,7 +942,7 @@ class SimpleKegHMI(BoxLayout):
             text='CAPTURE',
             font_size='14sp',
             bold=True,
-            background_color=hex_color(COLOR_BUTTON_NORMAL),
+            background_color=HEX['BUTTON_NORMAL'],
             background_normal='',
             disabled=True,
             on_press=self.force_capture
@@ -798,7 +951,7 @@ class SimpleKegHMI(BoxLayout):
         exit_btn = Button(
             text='EXIT',
             font_size='12sp',
-            background_color=hex_color(COLOR_ALERT_RED),
+            background_color=HEX['ALERT_RED'],
             background_normal='',
             on_press=self.confirm_exit
         )
@@ -815,7 +968,7 @@ class SimpleKegHMI(BoxLayout):
         self.network_status = Label(
             text='● ONLINE',
             font_size='12sp',
-            color=hex_color(COLOR_STATUS_GREEN),
+            color=HEX['STATUS_GREEN'],
             halign='left'
         )
         
@@ -834,7 +987,7 @@ class SimpleKegHMI(BoxLayout):
     
     def show_pallet_created(self, pallet_id, batch_id):
         """Show pallet creation confirmation in the UI display"""
-        print(f"\n[SHOW_PALLET_CREATED] Displaying pallet: {pallet_id} for batch: {batch_id}")
+        debug_print(f"\n[SHOW_PALLET_CREATED] Displaying pallet: {pallet_id} for batch: {batch_id}")
         # Format the text
         self.success_display.text = 'PALLET CREATED'
         self.pallet_display.text = pallet_id
@@ -845,8 +998,8 @@ class SimpleKegHMI(BoxLayout):
         self.pallet_display.opacity = 1
         self.batch_info_label.opacity = 1
         
-        print(f"[SHOW_PALLET_CREATED] UI updated - success_display: '{self.success_display.text}'")
-        print(f"[SHOW_PALLET_CREATED] UI updated - pallet_display: '{self.pallet_display.text}'")
+        debug_print(f"[SHOW_PALLET_CREATED] UI updated - success_display: '{self.success_display.text}'")
+        debug_print(f"[SHOW_PALLET_CREATED] UI updated - pallet_display: '{self.pallet_display.text}'")
         
         # Auto-clear after 30 seconds
         Clock.schedule_once(lambda dt: self.clear_status_display(), 30)
@@ -854,14 +1007,14 @@ class SimpleKegHMI(BoxLayout):
     def show_status_message(self, message, msg_type="info"):
         """Show a status message in the display area"""
         if msg_type == "success":
-            color = COLOR_STATUS_GREEN
+            color = HEX['STATUS_GREEN']
         elif msg_type == "error":
-            color = COLOR_ALERT_RED
+            color = HEX['ALERT_RED']
         else:
-            color = COLOR_STATUS_BLUE
+            color = HEX['STATUS_BLUE']
         
         self.success_display.text = message
-        self.success_display.color = hex_color(color)
+        self.success_display.color = color
         self.pallet_display.text = ''
         self.batch_info_label.text = ''
         
@@ -882,13 +1035,22 @@ class SimpleKegHMI(BoxLayout):
         self.pallet_display.opacity = 0.5
         self.batch_info_label.opacity = 0.5
     
+    def _run_aio_loop(self):
+        """Background loop thread (executor threads it spawns inherit its cores)"""
+        pin_current_thread(self._background_cores)
+        self._aio_loop.run_forever()
+
+    def run_async(self, coro):
+        """Schedule a coroutine on the background event loop (thread-safe)"""
+        return asyncio.run_coroutine_threadsafe(coro, self._aio_loop)
+
     def fetch_beer_types(self, dt=None):
-        """Fetch beer types from cloud API (Background Thread)"""
-        threading.Thread(target=self._fetch_beer_types_thread, daemon=True).start()
+        """Fetch beer types from cloud API (Background Loop)"""
+        self.run_async(self._fetch_beer_types_async())
 
-    def _fetch_beer_types_thread(self):
+    async def _fetch_beer_types_async(self):
         try:
-            beer_types = self.api_sender.get_beer_types()
+            beer_types = await self._aio_loop.run_in_executor(None, self.api_sender.get_beer_types)
             if beer_types:
                 Clock.schedule_once(lambda dt: self._update_beer_types(beer_types))
             else:
@@ -897,59 +1059,52 @@ class SimpleKegHMI(BoxLayout):
             self.add_log(f"Failed to fetch beer types: {str(e)[:50]}")
 
     def _update_beer_types(self, beer_types_data):
-        # Handle list of dicts [{'name': '...', 'id': '...'}]
-        self.beer_type_map = {}
-        names = []
-        
         # Preserve current selection
         current_selection = self.beer_display.text
         
-        for item in beer_types_data:
-            if isinstance(item, dict):
-                name = item.get('name', 'Unknown')
-                # Cloud uses _id, fallback to id, then name
-                bid = item.get('_id', item.get('id', name))
-                self.beer_type_map[name] = bid
-                names.append(name)
-            else:
-                # Fallback for strings
-                name = str(item)
-                self.beer_type_map[name] = name
-                names.append(name)
+        # Handle list of dicts [{'name': '...', 'id': '...'}] or plain strings
+        self.beer_type_map = dict(map(_beer_entry, beer_types_data))
                 
-        self.beer_types = names if names else ["Lager"]
-        
-        # Update spinner values
+        # Spinner values come straight from the map keys (insertion order)
+        self.beer_types = list(self.beer_type_map) or ["Lager"]
         self.beer_display.values = self.beer_types
         
-        # Restore selection if it exists in new list, otherwise default to first
-        if current_selection in self.beer_types:
+        # Restore selection if it exists in new map, otherwise default to first
+        if current_selection in self.beer_type_map:
             self.beer_display.text = current_selection
         else:
             self.beer_display.text = self.beer_types[0]
+        # Text may be unchanged (no on_text event) while its id changed
+        self.selected_beer_id = self.beer_type_map.get(self.beer_display.text)
             
-        self.add_log(f"Beer types loaded: {len(names)} types")
+        self.add_log(f"Beer types loaded: {len(self.beer_type_map)} types")
     
     def set_auto_mode(self, instance):
         self.is_auto_mode = True
-        self.auto_btn.background_color = hex_color(COLOR_HIGHLIGHT)
-        self.manual_btn.background_color = hex_color(COLOR_BUTTON_NORMAL)
+        self.auto_btn.background_color = HEX['HIGHLIGHT']
+        self.manual_btn.background_color = HEX['BUTTON_NORMAL']
         self.add_log("Auto mode: Syncing with cloud...")
         self.sync_cloud()
     
     def set_manual_mode(self, instance):
         self.is_auto_mode = False
-        self.manual_btn.background_color = hex_color(COLOR_HIGHLIGHT)
-        self.auto_btn.background_color = hex_color(COLOR_BUTTON_NORMAL)
+        self.manual_btn.background_color = HEX['HIGHLIGHT']
+        self.auto_btn.background_color = HEX['BUTTON_NORMAL']
         self.add_log("Manual mode: Set keg count manually")
     
     def on_beer_type_select(self, spinner, text):
         """Handle beer type selection"""
+        self.selected_beer_id = self.beer_type_map.get(text)
         self.add_log(f"Beer type selected: {text}")
     
-    def update_filling_date(self, dt=None):
-        """Update the filling date display"""
-        self.filling_date_display.text = datetime.now().strftime('%d-%m-%Y %H:%M')
+    def update_filling_date(self):
+        """Push the filling date to the UI when the minute changes (Background Loop)"""
+        stamp = fmt_now()
+        if stamp != self._last_filling_date:
+            self._last_filling_date = stamp
+            Clock.schedule_once(lambda dt: setattr(self.filling_date_display, 'text', stamp))
+        # Re-arm on the next minute boundary so the label never drifts
+        self._aio_loop.call_later(60 - time.time() % 60, self.update_filling_date)
     
     def change_count(self, instance):
         """Open modal to change target keg count"""
@@ -981,14 +1136,14 @@ class SimpleKegHMI(BoxLayout):
         # Clear duplicate warning when batch number changes
         self.duplicate_warning.text = ''
         self.status_label.text = 'Waiting for kegs...'
-        self.status_label.color = hex_color(COLOR_TEXT_LIGHT)
+        self.status_label.color = HEX['TEXT_LIGHT']
+        self._last_display_state = None
 
     def increment_batch_number(self):
         """Auto-increment batch number after success"""
         current = self.batch_display.text
         # Try to find trailing number
-        import re
-        match = re.search(r'(\d+)$', current)
+        match = _TRAILING_DIGITS_RE.search(current)
         if match:
             num_str = match.group(1)
             num_len = len(num_str)
@@ -1007,59 +1162,77 @@ class SimpleKegHMI(BoxLayout):
             return
 
         if self.is_auto_mode:
+            # Stale-while-revalidate: apply the last good config right away,
+            # only go to the network when it is older than the TTL
+            cached, age = load_cloud_config()
+            if cached is not None:
+                self._apply_sync_success(*self._parse_cloud_config(cached))
+                if age < CLOUD_CONFIG_CACHE_TTL:
+                    return
+            if time.monotonic() < self._sync_circuit_open_until:
+                self.add_log("Cloud sync paused after repeated failures")
+                return
             self.syncing = True
             self.add_log("Syncing with cloud...")
-            threading.Thread(target=self._sync_thread, daemon=True).start()
+            self.run_async(self._sync_async())
         else:
             self.add_log("Manual mode - using local config")
     
-    def _sync_thread(self):
-        """Background thread for cloud sync"""
+    def _parse_cloud_config(self, data):
+        """Extract (count, keg_type) from a cloud config response"""
+        keg_type = data.get("keg_type", DEFAULT_KEG_TYPE)
+        return pallet_capacity(keg_type, DEFAULT_PALLET_TYPE), keg_type
+    
+    async def _sync_async(self):
+        """Cloud sync coroutine (Background Loop)"""
         try:
             # Try to get configuration from cloud
-            mac_address = CAMERA_MAC_ID
-            if not mac_address or mac_address == "3C:6D:66:01:5A:F0":
-                # Get actual MAC address
-                mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff) 
-                               for elements in range(0, 2*6, 2)][::-1])
-                mac_address = mac.upper()
-            
-            payload = {"macId": mac_address}
-            
-            # Use configured endpoint
-            endpoints = [CLOUD_CONFIG_ENDPOINT]
+            payload = {"macId": self._mac_address}
             
-            success = False
-            for endpoint in endpoints:
+            # Retry transient failures (timeouts, refused connections, 5xx) with
+            # jittered exponential backoff; a 4xx will not fix itself, so stop
+            response = None
+            for attempt in range(SYNC_RETRY_ATTEMPTS):
                 try:
-                    response = requests.post(
-                        endpoint,
+                    response = await self._aio_loop.run_in_executor(None, lambda: _SYNC_SESSION.post(
+                        CLOUD_CONFIG_ENDPOINT,
                         json=payload,
-                        timeout=5,
-                        verify=False
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        # Parse configuration from response
-                        keg_type = data.get("keg_type", "30L")
-                        count = KEG_TYPES.get(keg_type, {}).get('EUR Pallet', DEFAULT_KEG_COUNT)
-                        
-                        # Apply updates on main thread
-                        Clock.schedule_once(lambda dt: self._apply_sync_success(count, keg_type))
-                        success = True
+                        timeout=(API_CONNECT_TIMEOUT, 5)
+                    ))
+                    if response.status_code < 500:
                         break
-                except:
-                    continue
+                except (requests.Timeout, requests.ConnectionError):
+                    response = None
+                if attempt + 1 < SYNC_RETRY_ATTEMPTS:
+                    await asyncio.sleep(sync_backoff(attempt))
             
-            if not success:
-                 Clock.schedule_once(lambda dt: self._apply_sync_fail("Cloud sync failed: No valid response"))
+            if response is not None and response.status_code == 200:
+                data = response.json()
+                # Parse configuration from response
+                count, keg_type = self._parse_cloud_config(data)
+                save_cloud_config(data)
+                self._sync_failure_count = 0
+                
+                # Apply updates on main thread
+                self._apply_sync_success(count, keg_type)
+            else:
+                self._record_sync_failure()
+                self._apply_sync_fail("Cloud sync failed: No valid response")
 
         except Exception as e:
-            err_msg = str(e)
-            Clock.schedule_once(lambda dt: self._apply_sync_fail(f"Sync error: {err_msg[:50]}"))
+            self._record_sync_failure()
+            self._apply_sync_fail(f"Sync error: {str(e)[:50]}")
         finally:
             self.syncing = False
+    
+    def _record_sync_failure(self):
+        """Count a failed sync; open the circuit after too many in a row"""
+        self._sync_failure_count += 1
+        if self._sync_failure_count >= SYNC_CIRCUIT_THRESHOLD:
+            self._sync_failure_count = 0
+            self._sync_circuit_open_until = time.monotonic() + SYNC_CIRCUIT_OPEN_SECONDS
 
+    @mainthread
     def _apply_sync_success(self, count, keg_type):
         """Update UI with sync results (Main Thread)"""
         self.required_keg_count = count
@@ -1067,38 +1240,82 @@ class SimpleKegHMI(BoxLayout):
         self.target_display.text = str(count)
         self.add_log(f"Cloud sync: {count} {keg_type} kegs")
         
+    @mainthread
     def _apply_sync_fail(self, error_msg):
         """Log sync failure (Main Thread)"""
         self.add_log(error_msg)
     
+    def _update_cam_frame(self, instance, value):
+        """Follow the camera container's layout with its background and border"""
+        self._cam_bg.pos, self._cam_bg.size = instance.pos, instance.size
+        self._cam_border.rectangle = (*instance.pos, *instance.size)
+    
+    def _build_preview_renderer(self, width, height):
+        """(Re)allocate the preview buffer/texture for one camera resolution and a resize specialized for it"""
+        # Preview keeps the frame's aspect ratio, whatever resolution the camera delivers
+        dsize = (int(width * PREVIEW_SCALE), int(height * PREVIEW_SCALE))
+        buf = np.empty((dsize[1], dsize[0], 3), dtype=np.uint8)
+        self._preview_buf = buf
+        # 1-D view over the same memory: blit_buffer reads it through the buffer
+        # protocol (contiguous, 1-D, writable), so no per-frame bytes copy
+        self._preview_flat = buf.reshape(-1)
+        self._preview_tex = Texture.create(size=dsize, colorfmt='bgr')
+        
+        expected = (height, width)
+        scale = (dsize[0] / width, dsize[1] / height)
+        resize, area = cv2.resize, cv2.INTER_AREA
+        
+        def render(frame):
+            # Returns the overlay (sx, sy), or None if the frame is not width x height
+            if frame.shape[:2] != expected:
+                return None
+            resize(frame, dsize, dst=buf, interpolation=area)
+            return scale
+        self._render_preview = render
+    
+    def _get_placeholder_texture(self):
+        """Build the 'Camera Not Initialized' texture once"""
+        if self._placeholder_tex is None:
+            # Create black frame (placeholder size 640x480)
+            img_h, img_w = 480, 640
+            vis_frame = np.zeros((img_h, img_w, 3), dtype=np.uint8)
+            
+            # Draw text
+            text = "Camera Not Initialized"
+            font = cv2.FONT_HERSHEY_SIMPLEX
+            font_scale = 1.0
+            thickness = 2
+            text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
+            text_x = (img_w - text_size[0]) // 2
+            text_y = (img_h + text_size[1]) // 2
+            
+            # Red text
+            cv2.putText(vis_frame, text, (text_x, text_y), font, font_scale, (0, 0, 255), thickness)
+            
+            buf = cv2.flip(vis_frame, 0).tobytes()
+            texture = Texture.create(size=(img_w, img_h), colorfmt='bgr')
+            texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
+            self._placeholder_tex = texture
+        return self._placeholder_tex
+    
+    def _set_frame_rate(self, fps):
+        """Reschedule update_frame at a new rate (no-op if unchanged)"""
+        if fps != self._frame_fps:
+            self._frame_fps = fps
+            self._frame_event.cancel()
+            self._frame_event = Clock.schedule_interval(self.update_frame, 1.0 / fps)
+    
     def update_frame(self, dt):
         """Update camera frame and process detection"""
         if not self.detection_active or not self.camera:
             # Show camera not initialized
             try:
-                # Create black frame (placeholder size 640x480)
-                img_h, img_w = 480, 640
-                vis_frame = np.zeros((img_h, img_w, 3), dtype=np.uint8)
-                
-                # Draw text
-                text = "Camera Not Initialized"
-                font = cv2.FONT_HERSHEY_SIMPLEX
-                font_scale = 1.0
-                thickness = 2
-                text_size = cv2.getTextSize(text, font, font_scale, thickness)[0]
-                text_x = (img_w - text_size[0]) // 2
-                text_y = (img_h + text_size[1]) // 2
-                
-                # Red text
-                cv2.putText(vis_frame, text, (text_x, text_y), font, font_scale, (0, 0, 255), thickness)
-                
-                # Update preview
-                buf = cv2.flip(vis_frame, 0).tobytes()
-                texture = Texture.create(size=(img_w, img_h), colorfmt='bgr')
-                texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-                self.preview_image.texture = texture
+                texture = self._get_placeholder_texture()
+                if self.preview_image.texture is not texture:
+                    self.preview_image.texture = texture
             except Exception:
                 pass
+            self._set_frame_rate(IDLE_UI_FPS)
             return
 
         if self.processing:
@@ -1106,68 +1323,140 @@ class SimpleKegHMI(BoxLayout):
         
         ret, frame = self.camera.get_frame()
         if ret and frame is not None:
-            # Update preview
-            # Create visualization frame
-            vis_frame = frame.copy()
+            # Render into the persistent preview buffer; overlays are drawn
+            # there too, so the full-resolution frame is never copied
+            scale = self._render_preview(frame)
+            if scale is None:
+                # Camera delivers another resolution than configured: re-specialize
+                self._build_preview_renderer(frame.shape[1], frame.shape[0])
+                scale = self._render_preview(frame)
+            sx, sy = scale
+            
+            # Hot attributes bound once per tick (20 Hz), after any re-specialize
+            preview = self.preview_image
+            tex = self._preview_tex
+            vis_frame = self._preview_buf
+            det_q = self._det_q
             
             # Detect and draw QR codes
             try:
                 # Async Detection Logic - "Latest Frame Only" Strategy
 
-                # 1. Check if ANY previous detection finished
-                if self.current_detection_task and self.current_detection_task.done():
-                    try:
-                        # Get results (list of dicts, total_boxes)
-                        results = self.current_detection_task.result()
-                        if results:
-                            self.latest_qr_results = results[0] # Index 0 is the list of QRs
-                    except Exception as e:
-                        pass # Squelch errors to keep UI alive
-                    finally:
-                        self.current_detection_task = None
-
-                # 2. Submit new detection if idle
-                # Only submit if we are not currently processing a frame
-                if self.current_detection_task is None:
-                    # IMPORTANT: Pass a COPY of the frame to the thread to avoid memory race conditions
-                    # detector handles resizing internally
-                    self.current_detection_task = self.detector_executor.submit(
-                        self.qr_detector.detect_and_decode, 
-                        vis_frame.copy()
-                    )
+                # 1. Hand the freshest frame to the detector thread; a frame it
+                # has not picked up yet is stale and gets replaced. Results come
+                # back through _on_qr_results on the Kivy thread.
+                # camera.get_frame() returns a fresh array and nothing writes
+                # to `frame`, so the worker can use it without a copy
+                _put_latest(det_q, frame)
 
-                # 3. Draw LATEST known results (Visual Feedback)
+                # 2. Draw LATEST known results (Visual Feedback)
                 # This happens at clock speed (UI FPS), decoupled from detection speed
+                rectangle, put_text = cv2.rectangle, cv2.putText
                 for qr in self.latest_qr_results:
-                    x1, y1, x2, y2 = qr['bbox']
+                    bx1, by1, bx2, by2 = qr['bbox']
+                    x1, y1, x2, y2 = int(bx1 * sx), int(by1 * sy), int(bx2 * sx), int(by2 * sy)
                     # Draw green boundary
-                    cv2.rectangle(vis_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                    rectangle(vis_frame, (x1, y1), (x2, y2), QR_BOX_COLOR, 2)
                     
                     # Draw text label background
-                    label = qr['data'][:10] + '...' if len(qr['data']) > 10 else qr['data']
-                    t_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)[0]
-                    cv2.rectangle(vis_frame, (x1, y1-20), (x1+t_size[0], y1), (0, 255, 0), -1)
-                    cv2.putText(vis_frame, label, (x1, y1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+                    data = qr['data']
+                    label = data[:10] + '...' if len(data) > 10 else data
+                    t_size = _text_size(label)
+                    rectangle(vis_frame, (x1, y1-20), (x1+t_size[0], y1), QR_BOX_COLOR, -1)
+                    put_text(vis_frame, label, (x1, y1-5), QR_FONT, 0.5, QR_TEXT_COLOR, 1)
 
             except Exception as e:
                 pass
                 # self.add_log(f"QR Vis Error: {str(e)[:20]}")
 
-            # Update preview with visualization frame
-            buf = cv2.flip(vis_frame, 0).tobytes()
-            texture = Texture.create(size=(vis_frame.shape[1], vis_frame.shape[0]), colorfmt='bgr')
-            texture.blit_buffer(buf, colorfmt='bgr', bufferfmt='ubyte')
-            texture.flip_vertical()
-            self.preview_image.texture = texture
+            # Update preview in place. The old cv2.flip + texture.flip_vertical()
+            # pair cancelled out, so the buffer is uploaded unflipped.
+            tex.blit_buffer(self._preview_flat, colorfmt='bgr', bufferfmt='ubyte', mipmap_generation=False)
+            if preview.texture is not tex:
+                preview.texture = tex
+            else:
+                preview.canvas.ask_update()
+            
+            # Process frame for keg detection (every Nth frame only)
+            counter = self._frame_counter = self._frame_counter + 1
+            if counter % self._detect_every == 0:
+                self.process_frame(frame)
             
-            # Process frame for keg detection
-            self.process_frame(frame)
+            # Full rate while kegs or QR codes are in view, idle rate after a quiet spell
+            now = time.monotonic()
+            if self.latest_qr_results or self.current_count:
+                self._last_activity = now
+                self._set_frame_rate(UI_FPS)
+            elif now - self._last_activity > IDLE_AFTER_SECONDS:
+                self._set_frame_rate(IDLE_UI_FPS)
+    
+    def _update_qr_fingerprint(self, qr_results):
+        """Refresh the cached QR set only when the detected strings changed"""
+        # Order-independent sum of string hashes (a sum, unlike XOR, does not
+        # cancel when the same QR is reported twice)
+        fp = sum(hash(qr['data']) for qr in qr_results)
+        if fp != self._latest_qr_fp:
+            self._latest_qr_fp = fp
+            self._latest_qr_set = frozenset(qr['data'] for qr in qr_results)
+    
+    def _detect_loop(self, cores):
+        """Live detector thread: always works on the latest queued frame"""
+        pin_current_thread(cores)
+        while True:
+            frame = self._det_q.get()
+            if frame is None:
+                break
+            try:
+                # Index 0 is the list of QRs (second item is total_boxes)
+                qr_results = self._detect_qr(frame)[0]
+            except Exception:
+                continue  # Squelch errors to keep UI alive
+            Clock.schedule_once(lambda dt, r=qr_results: self._on_qr_results(r))
+    
+    def _on_qr_results(self, qr_results):
+        """Publish live detection results (Main Thread)"""
+        self.latest_qr_results = qr_results
+        self._update_qr_fingerprint(qr_results)
+    
+    def _detect_qr(self, frame):
+        """Preprocess (gray + texture mask) and run QR detection (worker thread)"""
+        gray, mask = preprocess(frame)
+        return self.qr_detector.detect_and_decode(frame, gray=gray, mask=mask)
+    
+    def _pace_detection(self, elapsed):
+        """Adapt the keg detection interval to the last detection time"""
+        if elapsed > DETECT_BUDGET_SECONDS:
+            self._detect_every = min(self._detect_every + 1, DETECT_EVERY_MAX)
+        elif elapsed < DETECT_BUDGET_SECONDS / 2:
+            self._detect_every = max(self._detect_every - 1, DETECT_EVERY)
     
     def process_frame(self, frame):
-        """Process frame for keg detection"""
+        """Hand a frame to the keg detector thread (latest frame wins)"""
+        _put_latest(self._keg_q, frame)
+    
+    def _keg_loop(self, cores):
+        """Keg detector thread: detect on the latest queued frame, post the count back"""
+        pin_current_thread(cores)
+        while True:
+            frame = self._keg_q.get()
+            if frame is None:
+                break
+            try:
+                # Detect on a downscaled copy; YOLO resizes to 640 anyway
+                started = time.monotonic()
+                small = cv2.resize(frame, None, fx=DETECT_SCALE, fy=DETECT_SCALE, interpolation=cv2.INTER_AREA)
+                detection = self.keg_detector.detect(small)
+                elapsed = time.monotonic() - started
+            except Exception as e:
+                self.add_log(f"Detect error: {str(e)[:50]}", LOG_ERROR)
+                continue
+            self._on_keg_result(detection['count'], frame, elapsed)
+    
+    @mainthread
+    def _on_keg_result(self, new_count, frame, elapsed):
+        """Apply a keg count: stability, display and auto-capture (Main Thread)"""
         try:
-            detection = self.keg_detector.detect(frame)
-            new_count = detection['count']
+            self._pace_detection(elapsed)
             
             # Check stability
             if new_count == self.prev_count:
@@ -1178,13 +1467,13 @@ class SimpleKegHMI(BoxLayout):
             self.prev_count = new_count
             self.current_count = new_count
             
+            # Get effective count (best of keg or QR detection)
+            qr_count = self.qr_count = len(self.latest_qr_results)
+            effective_count = self.effective_count = new_count if new_count >= qr_count else qr_count
+            
             # Update UI
             self.update_display()
             
-            # Get effective count (best of keg or QR detection)
-            qr_count = len(self.latest_qr_results) if hasattr(self, 'latest_qr_results') else 0
-            effective_count = max(self.current_count, qr_count)
-            
             # Auto-capture when stable, count matches rules, and not empty
             if (self.is_auto_mode and
                 self.stability_counter >= STABILITY_THRESHOLD and 
@@ -1195,44 +1484,46 @@ class SimpleKegHMI(BoxLayout):
                 self.show_auto_capture_confirmation(frame)
                 
         except Exception as e:
-            self.add_log(f"Detect error: {str(e)[:50]}")
+            self.add_log(f"Detect error: {str(e)[:50]}", LOG_ERROR)
     
     def update_display(self):
         """Update all UI displays"""
-        # Update count displays
-        self.current_display.text = str(self.current_count)
+        # Counts were computed for this frame by _on_keg_result
+        effective_count = self.effective_count
         
-        # Get QR count from live detection
-        qr_count = len(self.latest_qr_results) if hasattr(self, 'latest_qr_results') else 0
+        # Skip the widget writes when none of their inputs changed
+        state = (self.processing, self.current_count, self.qr_count, self.is_auto_mode, self.required_keg_count)
+        if state == self._last_display_state:
+            return
         
-        # Use the better of keg count or QR count for target status
-        effective_count = max(self.current_count, qr_count)
+        # Update count displays
+        self.current_display.text = str(self.current_count)
         
         # Update colors based on status
         if self.processing:
-            self.current_display.color = hex_color(COLOR_STATUS_ORANGE)
+            self.current_display.color = HEX['STATUS_ORANGE']
             self.system_status.text = '[b]● PROCESSING[/b]'
-            self.system_status.color = hex_color(COLOR_STATUS_ORANGE)
+            self.system_status.color = HEX['STATUS_ORANGE']
             self.status_label.text = "Processing batch..."
-            self.status_label.color = hex_color(COLOR_STATUS_ORANGE)
+            self.status_label.color = HEX['STATUS_ORANGE']
         else:
             # Update status label based on detected vs target count
             # Show effective count vs target in simple format
             if effective_count < self.required_keg_count:
                 self.status_label.text = f"Target Not Achieved ({effective_count}/{self.required_keg_count})"
-                self.status_label.color = hex_color(COLOR_STATUS_ORANGE)
+                self.status_label.color = HEX['STATUS_ORANGE']
                 self.system_status.text = '[b]● DETECTING[/b]'
-                self.system_status.color = hex_color(COLOR_STATUS_BLUE)
+                self.system_status.color = HEX['STATUS_BLUE']
             elif effective_count == self.required_keg_count:
                 self.status_label.text = f"Target Achieved ({effective_count}/{self.required_keg_count})"
-                self.status_label.color = hex_color(COLOR_STATUS_GREEN)
+                self.status_label.color = HEX['STATUS_GREEN']
                 self.system_status.text = '[b]● READY TO CAPTURE[/b]'
-                self.system_status.color = hex_color(COLOR_STATUS_GREEN)
+                self.system_status.color = HEX['STATUS_GREEN']
             else:  # effective_count > required_keg_count
                 self.status_label.text = f"WARNING: Count exceeds target! ({effective_count}/{self.required_keg_count})"
-                self.status_label.color = hex_color(COLOR_ALERT_RED)
+                self.status_label.color = HEX['ALERT_RED']
                 self.system_status.text = '[b]● CHECK COUNT[/b]'
-                self.system_status.color = hex_color(COLOR_ALERT_RED)
+                self.system_status.color = HEX['ALERT_RED']
             
         # Button Logic - Override for Manual Mode
         if not self.processing:
@@ -1240,14 +1531,16 @@ class SimpleKegHMI(BoxLayout):
                 # Manual Mode: Enable capture ONLY if we see kegs OR QR codes
                 if effective_count > 0:
                     self.capture_btn.disabled = False
-                    self.capture_btn.background_color = hex_color(COLOR_HIGHLIGHT)
+                    self.capture_btn.background_color = HEX['HIGHLIGHT']
                 else:
                     self.capture_btn.disabled = True
-                    self.capture_btn.background_color = hex_color(COLOR_BUTTON_NORMAL)
+                    self.capture_btn.background_color = HEX['BUTTON_NORMAL']
             else:
                 # Auto Mode: Capture button always disabled - use auto-trigger only
                 self.capture_btn.disabled = True
-                self.capture_btn.background_color = hex_color(COLOR_BUTTON_NORMAL)
+                self.capture_btn.background_color = HEX['BUTTON_NORMAL']
+
+        self._last_display_state = state
 
         # Progress bar removed - stability counter still tracked internally for auto-capture
     
@@ -1262,14 +1555,18 @@ class SimpleKegHMI(BoxLayout):
             return
         
         # Check if same kegs are still under camera (compare QR codes)
-        current_qr_set = set(qr['data'] for qr in self.latest_qr_results) if self.latest_qr_results else set()
+        current_qr_set = self._latest_qr_set
         if current_qr_set and self.last_captured_qr_set:
-            # Check overlap - if more than 50% match, same kegs are still there
-            overlap = len(current_qr_set & self.last_captured_qr_set)
+            # Unchanged fingerprint means exactly the captured kegs; otherwise
+            # check overlap - if more than 50% match, same kegs are still there
+            if self._latest_qr_fp == self._last_captured_qr_fp:
+                overlap = len(current_qr_set)
+            else:
+                overlap = len(current_qr_set & self.last_captured_qr_set)
             if overlap > 0 and overlap >= len(current_qr_set) * 0.5:
                 # Same kegs still under camera - don't trigger
                 self.duplicate_warning.text = "Same kegs detected - waiting for new pallet"
-                self.duplicate_warning.color = hex_color(COLOR_STATUS_ORANGE)
+                self.duplicate_warning.color = HEX['STATUS_ORANGE']
                 return
         
         # Validate beer type
@@ -1289,9 +1586,10 @@ class SimpleKegHMI(BoxLayout):
             # In auto mode: show warning and do NOT show popup
             # Operator needs to change batch number manually
             self.duplicate_warning.text = f"DUPLICATE: {batch} already sent!"
-            self.duplicate_warning.color = hex_color(COLOR_ALERT_RED)
+            self.duplicate_warning.color = HEX['ALERT_RED']
             self.status_label.text = "Change batch number to continue"
-            self.status_label.color = hex_color(COLOR_STATUS_ORANGE)
+            self.status_label.color = HEX['STATUS_ORANGE']
+            self._last_display_state = None
             self.stability_counter = 0  # Reset to avoid re-trigger immediately
             self.add_log(f"Duplicate batch {batch} - auto-skipped")
             # Don't show popup, just return
@@ -1320,7 +1618,8 @@ class SimpleKegHMI(BoxLayout):
             self.auto_confirm_pending = False
             if hasattr(self, '_pending_frame') and self._pending_frame is not None:
                 # Save current QR codes for same-keg detection
-                self.last_captured_qr_set = set(qr['data'] for qr in self.latest_qr_results) if self.latest_qr_results else set()
+                self.last_captured_qr_set = self._latest_qr_set
+                self._last_captured_qr_fp = self._latest_qr_fp
                 self.show_toast("Capturing kegs...", "info")
                 self.trigger_capture(self._pending_frame)
                 self._pending_frame = None
@@ -1345,12 +1644,12 @@ class SimpleKegHMI(BoxLayout):
     
     def trigger_capture(self, frame):
         """Trigger batch capture"""
-        print("\n" + "="*60)
-        print("TRIGGER_CAPTURE STARTED")
-        print("="*60)
+        debug_print("\n" + "="*60)
+        debug_print("TRIGGER_CAPTURE STARTED")
+        debug_print("="*60)
         
         if self.processing:
-            print("  -> BLOCKED: Already processing")
+            debug_print("  -> BLOCKED: Already processing")
             return
         
         # Clear any previous status display
@@ -1358,74 +1657,97 @@ class SimpleKegHMI(BoxLayout):
         
         beer_name = self.beer_display.text
         # Resolve ID from name
-        beer_id = self.beer_type_map.get(beer_name, beer_name)
+        beer_id = self.selected_beer_id or beer_name
         
         batch = self.batch_display.text
+        # Snapshot the target here; process_capture runs later on the writer thread
+        required = self.required_keg_count
         
         # Store user's batch for display in callbacks
         self.current_batch_number = batch
         
-        print(f"  Beer Name: {beer_name}")
-        print(f"  Beer ID: {beer_id}")
-        print(f"  Batch: {batch}")
-        print(f"  Required Keg Count: {self.required_keg_count}")
-        print(f"  Current Count: {self.current_count}")
+        debug_print(f"  Beer Name: {beer_name}")
+        debug_print(f"  Beer ID: {beer_id}")
+        debug_print(f"  Batch: {batch}")
+        debug_print(f"  Required Keg Count: {required}")
+        debug_print(f"  Current Count: {self.current_count}")
         
         if not batch:
-            print("  -> ERROR: Please enter batch number!")
+            debug_print("  -> ERROR: Please enter batch number!")
             self.add_log("Please enter batch number!")
             return
         
-        print(f"\n[CAPTURE] Triggered! Beer: {beer_name} (ID: {beer_id}) | Batch: {batch}")
+        debug_print(f"\n[CAPTURE] Triggered! Beer: {beer_name} (ID: {beer_id}) | Batch: {batch}")
         self.processing = True
         self.add_log(f"Capturing {self.current_count} kegs...")
         
-        # Save frame
+        # Frame path (the writer thread saves it before processing)
         image_name = f"batch_{create_timestamp()}.jpg"
-        frame_path = str(SAVE_FOLDER / image_name)
-        print(f"  -> Saving frame to: {frame_path}")
-        cv2.imwrite(frame_path, frame)
-        print(f"  -> Frame saved successfully")
+        frame_path = os.path.join(SAVE_FOLDER, image_name)
         
         # Generate session ID
         session_id = f"BATCH_{self.database.get_next_batch_number():04d}"
-        print(f"  -> Session ID: {session_id}")
+        debug_print(f"  -> Session ID: {session_id}")
         
         def process_capture():
-            print(f"\n{'='*60}")
-            print(f"PROCESS_CAPTURE THREAD STARTED")
-            print(f"{'='*60}")
-            print(f"  Session ID: {session_id}")
-            print(f"  Frame Path: {frame_path}")
-            print(f"  Image Name: {image_name}")
-            print(f"  Required Count: {self.required_keg_count}")
-            print(f"  Beer Type ID: {beer_id}")
-            print(f"  Batch: {batch}")
-            print(f"  -> Calling submit_batch...")
+            debug_print(f"\n{'='*60}")
+            debug_print(f"PROCESS_CAPTURE THREAD STARTED")
+            debug_print(f"{'='*60}")
+            debug_print(f"  Session ID: {session_id}")
+            debug_print(f"  Frame Path: {frame_path}")
+            debug_print(f"  Image Name: {image_name}")
+            debug_print(f"  Required Count: {required}")
+            debug_print(f"  Beer Type ID: {beer_id}")
+            debug_print(f"  Batch: {batch}")
+            debug_print(f"  -> Calling submit_batch...")
             
             try:
                 # Capture exact filling timestamp
-                filling_timestamp = datetime.now().strftime('%d-%m-%Y %H:%M:%S')
-                print(f"  Filling Date: {filling_timestamp}")
+                filling_timestamp = fmt_now('%d-%m-%Y %H:%M:%S')
+                debug_print(f"  Filling Date: {filling_timestamp}")
                 
                 submit_batch(
-                    frame_path, image_name, session_id, self.required_keg_count,
+                    frame_path, image_name, session_id, required,
                     beer_type=beer_id, 
                     batch=batch,
                     filling_date=filling_timestamp
                 )
-                print(f"  -> submit_batch completed")
+                debug_print(f"  -> submit_batch completed")
                 Clock.schedule_once(lambda dt: self.complete_capture(session_id), 3)
             except Exception as e:
-                print(f"  -> ERROR in submit_batch: {e}")
-                import traceback
+                debug_print(f"  -> ERROR in submit_batch: {e}")
                 traceback.print_exc()
-                self.add_log(f"Capture error: {str(e)[:50]}")
-                Clock.schedule_once(lambda dt: self.capture_failed(), 0)
+                self.add_log(f"Capture error: {str(e)[:50]}", LOG_ERROR)
+                self.capture_failed()
         
-        print("  -> Starting process_capture thread...")
-        threading.Thread(target=process_capture, daemon=True).start()
-        print("  -> Thread started")
+        # Hand off to the writer thread; never block the UI tick. A capture is a
+        # whole pallet, so a full queue fails it loudly instead of dropping one.
+        debug_print(f"  -> Queueing frame save: {frame_path}")
+        try:
+            self._save_q.put_nowait((frame_path, frame, process_capture))
+        except queue.Full:
+            debug_print("  -> ERROR: Capture save queue full")
+            self.add_log("Capture queue full - try again", LOG_ERROR)
+            self.capture_failed()
+    
+    def _save_worker(self):
+        """Capture writer thread: save each frame, then process it in order"""
+        pin_current_thread(self._background_cores)
+        while True:
+            frame_path, frame, on_saved = self._save_q.get()
+            try:
+                if not cv2.imwrite(frame_path, frame):
+                    raise IOError(f"cv2.imwrite failed for {frame_path}")
+                debug_print(f"  -> Frame saved successfully: {frame_path}")
+            except Exception as e:
+                logging.error(f"Failed to save capture frame: {e}")
+                self.add_log(f"Save error: {str(e)[:50]}", LOG_ERROR)
+                self.capture_failed()
+                continue
+            finally:
+                self._save_q.task_done()
+            # submit_batch runs here too, so batch inserts are serialized per capture
+            on_saved()
     
     def complete_capture(self, session_id):
         """Handle successful capture completion"""
@@ -1440,20 +1762,21 @@ class SimpleKegHMI(BoxLayout):
         self.add_log(f"Batch {user_batch} submitted")
         Clock.schedule_once(lambda dt: self.check_status(session_id, user_batch), 3)
     
+    @mainthread
     def capture_failed(self):
-        """Handle capture failure"""
+        """Handle capture failure (Main Thread)"""
         self.processing = False
         self.stability_counter = 0
-        self.add_log("Capture failed - check logs")
+        self.add_log("Capture failed - check logs", LOG_ERROR)
         self.show_toast("Capture Failed! Check logs for details.", "error")
     
     def check_status(self, session_id, user_batch=None):
         """Check batch status and show pallet confirmation"""
         # Use user_batch for display, session_id for DB lookup
         display_batch = user_batch or session_id
-        print(f"\n[CHECK_STATUS] Checking status for: {session_id} (display: {display_batch})")
+        debug_print(f"\n[CHECK_STATUS] Checking status for: {session_id} (display: {display_batch})")
         status = self.database.get_batch_status(session_id)
-        print(f"[CHECK_STATUS] Batch status: {status}")
+        debug_print(f"[CHECK_STATUS] Batch status: {status}")
         
         if status == 'api_failed':
             self.add_log(f"Batch {display_batch} failed to send")
@@ -1462,7 +1785,7 @@ class SimpleKegHMI(BoxLayout):
         elif status == 'api_sent':
             # Get response to extract Pallet ID
             response_json = self.database.get_batch_response(session_id)
-            print(f"[CHECK_STATUS] API Response from DB: {response_json}")
+            debug_print(f"[CHECK_STATUS] API Response from DB: {response_json}")
             
             # Auto-increment batch number for next run
             self.increment_batch_number()
@@ -1470,36 +1793,36 @@ class SimpleKegHMI(BoxLayout):
             if response_json:
                 try:
                     data = json.loads(response_json)
-                    print(f"[CHECK_STATUS] Parsed JSON: {data}")
+                    debug_print(f"[CHECK_STATUS] Parsed JSON: {data}")
                     pallet_id = data.get('paletteId') or data.get('palletId') or data.get('pallet_id') or data.get('id')
-                    print(f"[CHECK_STATUS] Extracted Pallet ID: {pallet_id}")
+                    debug_print(f"[CHECK_STATUS] Extracted Pallet ID: {pallet_id}")
                     
                     if pallet_id:
                         # Show in UI display prominently with user's batch
-                        print(f"[CHECK_STATUS] Calling show_pallet_created({pallet_id}, {display_batch})")
+                        debug_print(f"[CHECK_STATUS] Calling show_pallet_created({pallet_id}, {display_batch})")
                         self.show_pallet_created(pallet_id, display_batch)
                         # Also log it
                         self.add_log(f"Pallet Created: {pallet_id}")
                         self.show_toast(f"Pallet Created: {pallet_id}", "success", 5)
                     else:
-                        print("[CHECK_STATUS] No pallet_id found, showing success message")
+                        debug_print("[CHECK_STATUS] No pallet_id found, showing success message")
                         # Just show success message with user's batch
                         self.show_status_message(f"Batch {display_batch} Sent", "success")
                 except Exception as e:
-                    print(f"[CHECK_STATUS] Error parsing response: {e}")
+                    debug_print(f"[CHECK_STATUS] Error parsing response: {e}")
                     self.show_status_message(f"Batch {display_batch} Sent", "success")
             else:
-                print("[CHECK_STATUS] No response_json from DB")
+                debug_print("[CHECK_STATUS] No response_json from DB")
                 self.show_status_message(f"Batch {display_batch} Sent", "success")
     
     def force_capture(self, instance):
         """Manual capture trigger with confirmation dialog"""
-        print("\n" + "="*60)
-        print("CAPTURE BUTTON CLICKED")
-        print("="*60)
-        print(f"  Processing: {self.processing}")
-        print(f"  Current Count: {self.current_count}")
-        print(f"  Required Count: {self.required_keg_count}")
+        debug_print("\n" + "="*60)
+        debug_print("CAPTURE BUTTON CLICKED")
+        debug_print("="*60)
+        debug_print(f"  Processing: {self.processing}")
+        debug_print(f"  Current Count: {self.current_count}")
+        debug_print(f"  Required Count: {self.required_keg_count}")
         
         # Validate inputs first
         if self.processing:
@@ -1528,7 +1851,7 @@ class SimpleKegHMI(BoxLayout):
         if is_duplicate:
             duplicate_warning = "\n\n⚠ WARNING: This batch was already sent!"
             self.duplicate_warning.text = f"⚠ DUPLICATE: {batch}"
-            self.duplicate_warning.color = hex_color(COLOR_STATUS_ORANGE)
+            self.duplicate_warning.color = HEX['STATUS_ORANGE']
         else:
             self.duplicate_warning.text = ''
         
@@ -1537,15 +1860,15 @@ class SimpleKegHMI(BoxLayout):
         message = f"Capture {self.required_keg_count} kegs?\n\nBeer Type: {beer_type}\nBatch: {batch}{duplicate_warning}"
         
         def on_confirm():
-            print("  -> Confirmation received, getting frame...")
+            debug_print("  -> Confirmation received, getting frame...")
             ret, frame = self.camera.get_frame()
-            print(f"  -> Frame returned: ret={ret}, frame is None={frame is None}")
+            debug_print(f"  -> Frame returned: ret={ret}, frame is None={frame is None}")
             if ret and frame is not None:
-                print("  -> Calling trigger_capture...")
+                debug_print("  -> Calling trigger_capture...")
                 self.show_toast("Capturing kegs...", "info")
                 self.trigger_capture(frame)
             else:
-                print("  -> FAILED: Could not get frame from camera")
+                debug_print("  -> FAILED: Could not get frame from camera")
                 self.show_toast("Camera error! Could not get frame.", "error")
         
         modal = ConfirmationModal(
@@ -1560,77 +1883,126 @@ class SimpleKegHMI(BoxLayout):
         toast = ToastMessage(message, msg_type, duration)
         toast.open()
     
-    def check_network(self, dt):
-        """Check network connectivity via API Sender"""
-        if self.api_sender:
-            is_online = self.api_sender.get_network_status()
-            self._update_network_status(is_online)
+    async def _probe_network(self):
+        """Plain TCP connect to the API host - no DNS/HTTP round trip per check"""
+        host, port = self._probe_host, self._probe_port
+        try:
+            now = time.monotonic()
+            cached = self._dns_cache.get(host)
+            if cached is None or now - cached[1] > DNS_CACHE_TTL:
+                infos = await self._aio_loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+                cached = self._dns_cache[host] = (infos[0][4][0], now)
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(cached[0], port), NETWORK_PROBE_TIMEOUT
+            )
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+    
+    async def check_network(self):
+        """Check network connectivity every NETWORK_PROBE_INTERVAL s (Background Loop)"""
+        while True:
+            await asyncio.sleep(NETWORK_PROBE_INTERVAL)
+            is_online = await self._probe_network()
+            if is_online != self._last_online:
+                self._last_online = is_online
+                Clock.schedule_once(lambda dt, online=is_online: self._update_network_status(online))
 
     def _update_network_status(self, is_online):
         if is_online:
             self.network_status.text = 'ONLINE'
-            self.network_status.color = hex_color(COLOR_STATUS_GREEN)
+            self.network_status.color = HEX['STATUS_GREEN']
         else:
             self.network_status.text = 'OFFLINE'
-            self.network_status.color = hex_color(COLOR_ALERT_RED)
+            self.network_status.color = HEX['ALERT_RED']
     
-    def recover_batches(self, dt):
-        """Recover stuck batches"""
-        try:
-            stuck = self.database.get_stuck_batches(timeout_minutes=5)
-            if stuck:
-                self.add_log(f"Recovered {len(stuck)} stuck batches")
-        except:
-            pass
+    def recover_batches(self, dt=None):
+        """Recover stuck batches (Background Loop)"""
+        self.run_async(self._recover_batches_async())
+    
+    async def _recover_batches_async(self):
+        # get_stuck_batches handles its own DB errors
+        stuck = await self._aio_loop.run_in_executor(
+            None, functools.partial(self.database.get_stuck_batches, timeout_minutes=5)
+        )
+        if stuck:
+            self.add_log(f"Recovered {len(stuck)} stuck batches")
     
     def start_detection_system(self):
-        """Initialize camera system"""
+        """Initialize camera system (opened off the UI thread)"""
+        self.run_async(self._start_camera_async())
+    
+    async def _start_camera_async(self):
         try:
-            self.camera = CameraManager(CAMERA_CONFIG)
-            if self.camera.start():
-                self.detection_active = True
-                self.add_log("Camera started successfully")
-            else:
-                self.add_log("Camera failed to start")
+            camera = await self._aio_loop.run_in_executor(None, CameraManager, CAMERA_CONFIG)
+            started = await self._aio_loop.run_in_executor(None, camera.start)
         except Exception as e:
-            self.add_log(f"Camera error: {str(e)[:50]}")
+            self.add_log(f"Camera error: {str(e)[:50]}", LOG_ERROR)
+            return
+        self._on_camera_opened(camera, started)
     
-    def add_log(self, message):
-        """Add message to log display"""
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        log_entry = f"[{timestamp}] {message}"
-        self.workflow_logs.append(log_entry)
-        
-        # Keep last 10 logs
-        if len(self.workflow_logs) > 10:
-            self.workflow_logs = self.workflow_logs[-10:]
+    @mainthread
+    def _on_camera_opened(self, camera, started):
+        """Publish the opened camera to update_frame (Main Thread)"""
+        self.camera = camera
+        if started:
+            self.detection_active = True
+            self.add_log("Camera started successfully")
+            # The placeholder ran at the idle rate; preview at full rate again
+            self._last_activity = time.monotonic()
+            self._set_frame_rate(UI_FPS)
+        else:
+            self.add_log("Camera failed to start")
+    
+    def add_log(self, message, level=LOG_INFO):
+        """Add message to log display (formatted only when shown)"""
+        # Called from worker threads too; keep the three columns aligned
+        with self._log_lock:
+            self._log_ts.append(time.time())
+            self._log_lvl.append(level)
+            self._log_msg.append(message)
+            
+            # Keep last 10 logs
+            if len(self._log_msg) > 10:
+                del self._log_ts[:-10]
+                del self._log_lvl[:-10]
+                del self._log_msg[:-10]
         
         # Update system logs (optional - can be viewed in logs popup)
     
+    def _get_logs_popup(self):
+        """Build the logs popup once; later opens only refresh its data"""
+        if self._logs_popup is None:
+            # Only the visible rows get Label widgets
+            rv = RecycleView(viewclass='Label')
+            content = RecycleBoxLayout(
+                orientation='vertical',
+                default_size=(None, 25),
+                default_size_hint=(1, None),
+                size_hint_y=None
+            )
+            content.bind(minimum_height=content.setter('height'))
+            rv.add_widget(content)
+            
+            self._logs_popup = Popup(title='System Logs', size_hint=(0.8, 0.6), content=rv)
+        return self._logs_popup
+    
     def show_logs(self, instance):
         """Show detailed logs popup"""
-        from kivy.uix.popup import Popup
-        
-        popup = Popup(title='System Logs', size_hint=(0.8, 0.6))
-        
-        scroll = ScrollView()
-        content = BoxLayout(orientation='vertical', size_hint_y=None)
-        content.bind(minimum_height=content.setter('height'))
-        
-        for log_entry in reversed(self.workflow_logs):
-            label = Label(
-                text=log_entry,
-                font_size='10sp',
-                color=hex_color(COLOR_TEXT_LIGHT),
-                size_hint_y=None,
-                height=25,
-                halign='left',
-                text_size=(400, None)
-            )
-            content.add_widget(label)
+        popup = self._get_logs_popup()
+        
+        with self._log_lock:
+            rows = list(zip(self._log_ts, self._log_lvl, self._log_msg))
+        
+        popup.content.data = [{
+            'text': f"[{time.strftime('%H:%M:%S', time.localtime(ts))}] {message}",
+            'font_size': '10sp',
+            'color': HEX['ALERT_RED'] if level == LOG_ERROR else HEX['TEXT_LIGHT'],
+            'halign': 'left',
+            'text_size': (400, None)
+        } for ts, level, message in reversed(rows)]
         
-        scroll.add_widget(content)
-        popup.content = scroll
         popup.open()
     
     def confirm_exit(self, instance):
@@ -1652,6 +2024,13 @@ class SimpleKegHMI(BoxLayout):
         if hasattr(self, 'api_sender'):
             self.api_sender.stop_retry_monitor()
             self.api_sender.close()
+        if hasattr(self, '_det_q'):
+            # Replace any pending frame with the stop sentinel
+            _put_latest(self._det_q, None)
+            _put_latest(self._keg_q, None)
+        if hasattr(self, '_aio_loop'):
+            self._aio_loop.call_soon_threadsafe(self._aio_loop.stop)
+        _SYNC_SESSION.close()
 
 class SimpleKegApp(App):
     def build(self):
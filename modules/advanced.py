@@ -1,22 +1,45 @@
 # modules/advanced.py
 import os
+import functools
+import hashlib
+import threading
 import cv2
 import numpy as np
-from PIL import Image
+import torch
 from ultralytics import YOLO
 from pyzbar import pyzbar
 from pyzbar.pyzbar import ZBarSymbol
 from qreader import QReader
-import shutil
 import logging
-from config import QR_MODEL_PATH, TILE_SIZE, OVERLAP_RATIO, SCALE_FACTORS, MIN_CROP_SIZE, MIN_UPSCALE_SIZE
+from concurrent.futures import ThreadPoolExecutor
+from config import QR_MODEL_PATH, TILE_SIZE, TILE_BATCH_SIZE, OVERLAP_RATIO, SCALE_FACTORS, MIN_CROP_SIZE, MIN_UPSCALE_SIZE
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Same placement as the live detectors: GPU with FP16 when there is one
+device = 0 if torch.cuda.is_available() else 'cpu'
+use_half = torch.cuda.is_available()
+
+# 3x3 sharpen kernel for unblur_image (built once; float32 is what filter2D uses)
+SHARPEN_KERNEL = np.array([[-1, -1, -1],
+                           [-1,  9, -1],
+                           [-1, -1, -1]], dtype=np.float32)
+
+# pyzbar cascade gates: flat crops hold no QR, blurry ones don't binarize well
+MIN_DECODE_STDDEV = 15.0
+MIN_THRESHOLD_SHARPNESS = 50.0  # Laplacian variance below which adaptive threshold is skipped
+
+# pyzbar releases the GIL while decoding, so crops decode in parallel on threads
+decode_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="AdvancedDecode")
+
 class AdvancedQRDetector:
     def __init__(self, model_path=None):
         self.model_path = model_path or str(QR_MODEL_PATH)
+        # One model per detector instance: loaded once, shared by every tile
+        self.yolo = YOLO(self.model_path)
+        # Held by run_advanced_detection: the models are shared, one pass at a time
+        self.lock = threading.Lock()
         self.qreader = QReader(model_size='s', min_confidence=0.5)  
         self.slice_width, self.slice_height = TILE_SIZE
         self.overlap_width_ratio = OVERLAP_RATIO
@@ -25,12 +48,12 @@ class AdvancedQRDetector:
         self.min_crop_size = MIN_CROP_SIZE
         self.min_upscale_size = MIN_UPSCALE_SIZE
     
-    def tile_with_overlap(self, image_path, output_dir):
-        """Tile image with overlap - Matches your initial logic exactly."""
-        os.makedirs(output_dir, exist_ok=True)
-
-        image = Image.open(image_path).convert("RGB")
-        img_w, img_h = image.size
+    def tile_with_overlap(self, image_path):
+        """Tile image with overlap - Matches your initial logic; returns [(x, y, BGR tile)] in memory."""
+        image = cv2.imread(image_path)
+        if image is None:
+            raise FileNotFoundError(f"Advanced: Image not found: {image_path}")
+        img_h, img_w = image.shape[:2]
         
         logger.info(f"Advanced: Original image size: {img_w}x{img_h}")
 
@@ -43,76 +66,50 @@ class AdvancedQRDetector:
         logger.info(f"Advanced: Tile size: {self.slice_width}x{self.slice_height}")
         logger.info(f"Advanced: Overlap: {overlap_w}x{overlap_h} (steps: {step_x}x{step_y})")
 
-        tile_positions = []
-        
-        y = 0
-        while y < img_h:
-            x = 0
-            while x < img_w:
-                tile_positions.append((x, y))
-                x += step_x
-                if x >= img_w:
-                    break
-            y += step_y
-            if y >= img_h:
-                break
-        
-        # Add right and bottom edge tiles
+        # Grid origins plus a flush right/bottom edge; their product covers every
+        # grid, edge and corner tile exactly once, already sorted by (x, y)
+        xs = np.arange(0, img_w, step_x)
         if img_w > self.slice_width:
-            right_x = max(0, img_w - self.slice_width)
-            for y in range(0, img_h, step_y):
-                tile_positions.append((right_x, y))
-        
+            xs = np.union1d(xs, img_w - self.slice_width)
+        ys = np.arange(0, img_h, step_y)
         if img_h > self.slice_height:
-            bottom_y = max(0, img_h - self.slice_height)
-            for x in range(0, img_w, step_x):
-                tile_positions.append((x, bottom_y))
+            ys = np.union1d(ys, img_h - self.slice_height)
         
-        if img_w > self.slice_width and img_h > self.slice_height:
-            corner_pos = (max(0, img_w - self.slice_width), max(0, img_h - self.slice_height))
-            tile_positions.append(corner_pos)
+        grid_x, grid_y = np.meshgrid(xs, ys, indexing='ij')
+        origins = np.stack((grid_x.ravel(), grid_y.ravel()), axis=1)
         
-        tile_positions = sorted(list(set(tile_positions)))
+        logger.info(f"Advanced: Total tiles to generate: {len(origins)}")
         
-        logger.info(f"Advanced: Total tiles to generate: {len(tile_positions)}")
+        # Clip every tile to the image at once; drop slivers under a quarter tile
+        slice_dims = np.array((self.slice_width, self.slice_height))
+        ends = np.minimum(origins + slice_dims, (img_w, img_h))
+        keep = ((ends - origins) >= slice_dims * 0.25).all(axis=1)
         
-        tile_count = 0
-        for x, y in tile_positions:
-            x_end = min(x + self.slice_width, img_w)
-            y_end = min(y + self.slice_height, img_h)
-            
+        tiles = []
+        for x, y, x_end, y_end in np.hstack((origins, ends))[keep].tolist():
             actual_width = x_end - x
             actual_height = y_end - y
             
-            if actual_width < self.slice_width * 0.25 or actual_height < self.slice_height * 0.25:
-                continue
-            
-            box = (x, y, x_end, y_end)
-            tile = image.crop(box)
+            tile = image[y:y_end, x:x_end]
 
-            if tile.size != (self.slice_width, self.slice_height):
-                padded = Image.new("RGB", (self.slice_width, self.slice_height), (0, 0, 0))  # Black padding as in your initial
-                padded.paste(tile, (0, 0))
+            if (actual_width, actual_height) != (self.slice_width, self.slice_height):
+                padded = np.zeros((self.slice_height, self.slice_width, 3), dtype=np.uint8)  # Black padding as in your initial
+                padded[:actual_height, :actual_width] = tile
                 tile = padded
 
-            filename = f"tile_{tile_count:03d}_x{x}_y{y}.png"
-            tile.save(os.path.join(output_dir, filename))
-            tile_count += 1
+            tiles.append((x, y, tile))
 
-        logger.info(f"Advanced: Saved {tile_count} tiles to: {os.path.abspath(output_dir)}")
-        return tile_count
+        logger.info(f"Advanced: Generated {len(tiles)} tiles")
+        return tiles
 
     def unblur_image(self, image):
         """Unblur - Matches your initial logic exactly."""
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
-            gray = image.copy()
+            gray = image  # Only read below, no copy needed
         
-        sharpen_kernel = np.array([[-1,-1,-1], 
-                                 [-1, 9,-1], 
-                                 [-1,-1,-1]])
-        sharpened = cv2.filter2D(gray, -1, sharpen_kernel)
+        sharpened = cv2.filter2D(gray, -1, SHARPEN_KERNEL)
         
         gaussian = cv2.GaussianBlur(gray, (9, 9), 10.0)
         unsharp_mask = cv2.addWeighted(gray, 1.5, gaussian, -0.5, 0)
@@ -125,23 +122,33 @@ class AdvancedQRDetector:
         return combined
 
     def decode_qr_pyzbar(self, image):
-        """Pyzbar decode with enhancements - Matches your initial logic exactly."""
+        """Pyzbar decode with enhancements - raw, gray, adaptive threshold, morph close (gated)."""
         try:
-            decoded_objects = pyzbar.decode(image, symbols=[ZBarSymbol.QRCODE])
-            if decoded_objects:
-                return decoded_objects, True
+            color = len(image.shape) == 3
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if color else image
+            
+            # Uniform crop: no pass below can find a code in it
+            if cv2.meanStdDev(gray)[1][0, 0] < MIN_DECODE_STDDEV:
+                return [], False
+            
+            # The raw pass only differs from the gray one for color input
+            if color:
+                decoded_objects = pyzbar.decode(image, symbols=[ZBarSymbol.QRCODE])
+                if decoded_objects:
+                    return decoded_objects, True
             
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
             decoded_objects = pyzbar.decode(gray, symbols=[ZBarSymbol.QRCODE])
             if decoded_objects:
                 return decoded_objects, True
-                
-            adaptive_thresh = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
-            decoded_objects = pyzbar.decode(adaptive_thresh, symbols=[ZBarSymbol.QRCODE])
-            if decoded_objects:
-                return decoded_objects, True
+            
+            # Local binarization only helps when there are edges to binarize
+            if cv2.Laplacian(gray, cv2.CV_64F).var() >= MIN_THRESHOLD_SHARPNESS:
+                adaptive_thresh = cv2.adaptiveThreshold(
+                    gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                )
+                decoded_objects = pyzbar.decode(adaptive_thresh, symbols=[ZBarSymbol.QRCODE])
+                if decoded_objects:
+                    return decoded_objects, True
                 
             kernel = np.ones((3,3), np.uint8)
             morph = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
@@ -153,25 +160,23 @@ class AdvancedQRDetector:
             logger.error(f"Advanced: Error decoding QR code with pyzbar: {e}")
             return [], False
 
-    def detect_and_crop_qr_yolo(self, image_path, output_dir):
-        """YOLO detect/crop - Matches your initial logic (loads model per call, but efficient for fallback)."""
-        model = YOLO(self.model_path)  # As in your initial - loads fresh for isolation
-        image = cv2.imread(image_path)
-        if image is None:
-            raise FileNotFoundError(f"Advanced: Image not found: {image_path}")
-
-        results = model.predict(image, conf=0.3, iou=0.5, verbose=False)
-        os.makedirs(output_dir, exist_ok=True)
+    def detect_and_crop_qr_yolo(self, image):
+        """YOLO detect/crop on one BGR image - returns (crops, detection_count), crops kept in memory."""
+        results = self.yolo.predict(image, conf=0.3, iou=0.5, verbose=False, half=use_half, device=device)
 
-        cropped_paths = []
         detection_count = len(results[0].boxes) if results[0].boxes else 0
 
-        logger.info(f"Advanced: Found {detection_count} QR code(s) in {os.path.basename(image_path)}")
+        logger.info(f"Advanced: Found {detection_count} QR code(s)")
 
         if detection_count == 0:
-            return cropped_paths, detection_count
+            return [], detection_count
 
-        for i, box in enumerate(results[0].boxes):
+        return self._crop_detections(image, results[0]), detection_count
+
+    def _crop_detections(self, image, result):
+        """Pad and rescale every box of one YOLO result; returns the crops (unblurred later, on demand)."""
+        crops = []
+        for i, box in enumerate(result.boxes):
             confidence = box.conf[0].item()
             x1, y1, x2, y2 = map(int, box.xyxy[0])
             
@@ -186,122 +191,126 @@ class AdvancedQRDetector:
             if qr_crop.shape[0] < self.min_crop_size or qr_crop.shape[1] < self.min_crop_size:
                 continue
             
-            base_name = os.path.splitext(os.path.basename(image_path))[0]
+            # All scaled (w, h) pairs for this crop in one vectorized pass
+            crop_dims = np.array((qr_crop.shape[1], qr_crop.shape[0]), dtype=np.float32)
+            scaled_dims = (self.scale_factors[:, None] * crop_dims).astype(np.int32)
             
-            for scale in self.scale_factors:
-                new_w = int(qr_crop.shape[1] * scale)
-                new_h = int(qr_crop.shape[0] * scale)
-                
+            for scale, (new_w, new_h) in zip(self.scale_factors, scaled_dims):
                 if new_w < self.min_upscale_size or new_h < self.min_upscale_size:
                     continue
                     
-                scaled_qr = cv2.resize(qr_crop, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
-                unblurred_qr = self.unblur_image(scaled_qr)
-                
-                output_path = os.path.join(output_dir, f"{base_name}_qr_{i}_scale_{scale}.png")
-                unblurred_path = os.path.join(output_dir, f"{base_name}_qr_{i}_scale_{scale}_unblurred.png")
-                
-                cv2.imwrite(output_path, scaled_qr)
-                cv2.imwrite(unblurred_path, unblurred_qr)
-                cropped_paths.extend([output_path, unblurred_path])
+                scaled_qr = cv2.resize(qr_crop, (int(new_w), int(new_h)), interpolation=cv2.INTER_CUBIC)
+                crops.append(scaled_qr)
 
-        return cropped_paths, detection_count
+        return crops
 
-    def decode_qr_qreader(self, image_path):
+    def decode_qr_qreader(self, image):
         """QReader decode - Matches your initial logic exactly."""
-        image = cv2.imread(image_path)
-        if image is None:
-            return []
-
         try:
             decoded_qrs = self.qreader.detect_and_decode(image=image)
             return [qr.strip() for qr in decoded_qrs if qr and len(qr.strip()) > 0]
         except Exception as e:
-            logger.error(f"Advanced: QReader error for {image_path}: {e}")
+            logger.error(f"Advanced: QReader error: {e}")
             return []
 
-    def detect_advanced(self, image_path, temp_dir="advanced_temp"):
+    def _decode_crop(self, image, pyzbar_result, unique_qr_codes):
+        """QReader + pyzbar results for one crop into unique_qr_codes; True if either read anything."""
+        # Try QReader first
+        qr_results = self.decode_qr_qreader(image)
+        for qr in qr_results:
+            if qr not in unique_qr_codes:
+                unique_qr_codes.add(qr)
+                logger.info(f"Advanced: QReader decoded: {qr[:50]}{'...' if len(qr) > 50 else ''}")
+        
+        # Try pyzbar as backup
+        decoded_objects, success = pyzbar_result
+        found = bool(qr_results)
+        if success:
+            for obj in decoded_objects:
+                qr_data = obj.data.decode('utf-8').strip()
+                if qr_data:
+                    found = True
+                    if qr_data not in unique_qr_codes:
+                        unique_qr_codes.add(qr_data)
+                        logger.info(f"Advanced: pyzbar decoded: {qr_data[:50]}{'...' if len(qr_data) > 50 else ''}")
+        return found
+
+    def detect_advanced(self, image_path):
         """Main advanced detection - Matches your initial logic exactly (renamed from advanced_qr_detection for consistency)."""
         logger.info("ADVANCED QR DETECTION ACTIVATED")
         
-        # Create temporary directories
-        tiles_dir = os.path.join(temp_dir, "tiles")
-        cropped_dir = os.path.join(temp_dir, "cropped")
-        
-        # Clean up previous runs
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
-        
-        os.makedirs(tiles_dir, exist_ok=True)
-        os.makedirs(cropped_dir, exist_ok=True)
-        
         unique_qr_codes = set()
         
         try:
-            # Step 1: Tile the image
+            # Step 1: Tile the image (tiles and crops stay in memory, nothing is written to disk)
             logger.info("Advanced: Step 1 - Tiling image with overlap...")
-            tile_count = self.tile_with_overlap(image_path, tiles_dir)
+            tiles = self.tile_with_overlap(image_path)
+            tile_count = len(tiles)
             
             if tile_count == 0:
                 logger.warning("Advanced: No tiles generated, skipping advanced detection")
                 return list(unique_qr_codes)
             
-            # Step 2: Process each tile
+            # Step 2: Process the tiles, TILE_BATCH_SIZE per YOLO forward pass
             logger.info(f"Advanced: Step 2 - Processing {tile_count} tiles...")
-            all_cropped_paths = []
+            all_crops = []
             total_detections = 0
             
-            for tile_file in sorted(os.listdir(tiles_dir)):
-                if tile_file.lower().endswith(".png"):
-                    tile_path = os.path.join(tiles_dir, tile_file)
-                    cropped_paths, detections = self.detect_and_crop_qr_yolo(tile_path, cropped_dir)
+            for start in range(0, tile_count, TILE_BATCH_SIZE):
+                batch_tiles = tiles[start:start + TILE_BATCH_SIZE]
+                images = [tile for _, _, tile in batch_tiles]
+                results = self.yolo.predict(images, conf=0.3, iou=0.5, verbose=False, half=use_half, device=device)
+                
+                for (x, y, image), result in zip(batch_tiles, results):
+                    detections = len(result.boxes) if result.boxes else 0
+                    logger.info(f"Advanced: Found {detections} QR code(s) in tile x{x}_y{y}")
+                    if detections == 0:
+                        continue
                     total_detections += detections
-                    all_cropped_paths.extend(cropped_paths)
+                    all_crops.extend(self._crop_detections(image, result))
             
             logger.info(f"Advanced: Total detections across tiles: {total_detections}")
             
             # Step 3: Decode all cropped QR images
             logger.info("Advanced: Step 3 - Decoding QR codes...")
-            decoded_count = 0
             
-            for cropped_img in all_cropped_paths:
-                # Try QReader first
-                qr_results = self.decode_qr_qreader(cropped_img)
-                for qr in qr_results:
-                    if qr not in unique_qr_codes:
-                        unique_qr_codes.add(qr)
-                        decoded_count += 1
-                        logger.info(f"Advanced: QReader decoded: {qr[:50]}{'...' if len(qr) > 50 else ''}")
-                
-                # Try pyzbar as backup
-                image = cv2.imread(cropped_img)
-                if image is not None:
-                    decoded_objects, success = self.decode_qr_pyzbar(image)
-                    if success:
-                        for obj in decoded_objects:
-                            qr_data = obj.data.decode('utf-8').strip()
-                            if qr_data and qr_data not in unique_qr_codes:
-                                unique_qr_codes.add(qr_data)
-                                decoded_count += 1
-                                logger.info(f"Advanced: pyzbar decoded: {qr_data[:50]}{'...' if len(qr_data) > 50 else ''}")
+            # Byte-identical crops (same box found in overlapping tiles) decode once
+            seen_crops = set()
+            unique_crops = []
+            for image in all_crops:
+                key = (image.shape, hashlib.blake2b(image, digest_size=8).digest())
+                if key not in seen_crops:
+                    seen_crops.add(key)
+                    unique_crops.append(image)
+            all_crops = unique_crops
+            
+            # pyzbar runs on the pool for every crop while QReader (one model
+            # instance, not shared across threads) works through them here
+            pyzbar_jobs = [decode_executor.submit(self.decode_qr_pyzbar, image) for image in all_crops]
+            
+            for image, pyzbar_job in zip(all_crops, pyzbar_jobs):
+                if not self._decode_crop(image, pyzbar_job.result(), unique_qr_codes):
+                    # Unblurred variant only for crops neither decoder could read
+                    unblurred = self.unblur_image(image)
+                    self._decode_crop(unblurred, self.decode_qr_pyzbar(unblurred), unique_qr_codes)
             
             logger.info(f"Advanced: Decoding completed. Unique QR codes found: {len(unique_qr_codes)}")
             
         except Exception as e:
             logger.error(f"Advanced: Error in advanced detection pipeline: {e}")
         
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                logger.info("Advanced: Temporary files cleaned up")
-        
         return list(unique_qr_codes)
 
+@functools.lru_cache(maxsize=2)
+def _get_detector(model_path=None):
+    """One detector per model path, so QReader and YOLO load once per process."""
+    return AdvancedQRDetector(model_path)
+
 # Standalone function for external use (as in your initial)
 def run_advanced_detection(image_path, model_path=None):
-    detector = AdvancedQRDetector(model_path)
-    return detector.detect_advanced(image_path)
+    detector = _get_detector(model_path)
+    with detector.lock:
+        return detector.detect_advanced(image_path)
 
 if __name__ == "__main__":
     image_path = input("Enter image path for advanced detection test: ").strip()
@@ -5,11 +5,14 @@ import time
 import threading
 import json
 from datetime import datetime, timedelta
-from config import API_TIMEOUT, API_MAX_RETRIES, DB_PATH, CAMERA_NAME, API_ENDPOINT, CAMERA_MAC_ID, ENABLE_PAYLOAD_HASH, BEER_TYPES_ENDPOINT
+from config import API_TIMEOUT, API_CONNECT_TIMEOUT, API_MAX_RETRIES, DB_PATH, CAMERA_NAME, API_ENDPOINT, CAMERA_MAC_ID, ENABLE_PAYLOAD_HASH, BEER_TYPES_ENDPOINT, retry_backoff
 import sqlite3
 import hashlib
 import ssl
 import urllib3
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+import queue
 
 # Disable SSL warnings for development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -17,6 +20,14 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # Thread lock for database access
 db_lock = threading.RLock()
 
+# Keys the beer types endpoint has used for its list, in lookup order
+BEER_TYPES_KEYS = ("beer_types", "types", "beerTypes")
+
+
+def _body_text(response):
+    """Decode a response body without response.text's charset sniffing over the whole body"""
+    return response.content.decode(response.encoding or 'utf-8', errors='replace')
+
 class APISender:
     def __init__(self, api_url=None, timeout=None, max_retries=None, camera_name=None):
         """
@@ -24,6 +35,9 @@ class APISender:
         """
         # Use the ORIGINAL cloud API endpoint
         self.api_url = api_url or API_ENDPOINT
+        # Plain-HTTP retry target for SSL failures (None when the endpoint isn't HTTPS)
+        self._http_fallback_url = (self.api_url.replace("https://", "http://", 1)
+                                   if self.api_url.startswith("https://") else None)
         self.beer_types_url = BEER_TYPES_ENDPOINT
         self.timeout = timeout or API_TIMEOUT
         self.max_retries = max_retries or API_MAX_RETRIES
@@ -44,11 +58,13 @@ class APISender:
             allowed_methods=["GET", "POST"]
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Pooled keep-alive connections shared by the UI, sync and retry threads
+        # (maxsize above the thread count so a racing send never falls back to a throwaway socket)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, pool_block=False, max_retries=retry_strategy)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
         
-        # Set default headers
+        # Set default headers (Content-Type here covers every POST; no per-call headers needed)
         self.session.headers.update({
             'User-Agent': 'KegDetectionSystem/1.0',
             'Accept': 'application/json',
@@ -58,32 +74,58 @@ class APISender:
         self.logger = logging.getLogger(__name__)
         self.db_path = str(DB_PATH)
         
-        # Network monitoring
+        # One long-lived connection shared by the UI, worker and retry threads;
+        # db_lock serializes every use. WAL lives in the database file, so
+        # switching it on once here covers every later connection too.
+        self._conn = self._connect()
+        try:
+            with db_lock:
+                self._conn.execute('PRAGMA journal_mode=WAL;')
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to enable WAL mode: {e}")
+        
+        # Network monitoring (base URL parsed once, not per check)
+        parsed = urlsplit(self.api_url)
+        self.network_check_url = f"{parsed.scheme}://{parsed.netloc}"
         self.network_online = True
-        self.last_network_check = None
+        self.last_network_check = None  # time.monotonic() of the last check
         self.network_check_interval = 30  # seconds
         
         # Retry thread
         self.retry_thread = None
         self.running = False
+        self._closing = False  # close() requested; the monitor releases resources if it outlives the join
         self.retry_interval = 60  # seconds
+        self.retry_batch_size = 16  # rows pulled from the queue per tick
+        self._wake = threading.Event()  # Cuts the monitor's wait short (stop, newly queued batch)
+        # Queued batches are independent, so a tick waits on the slowest send, not the sum
+        self._retry_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="api_retry")
+        self.optimize_interval = 900  # seconds between PRAGMA optimize runs
+        self.last_optimize = time.monotonic()
         
         # Start monitoring
         self.start_retry_monitor()
         self.logger.info(f"API Sender initialized. Endpoint: {self.api_url}")
 
+    def _connect(self):
+        """Open a connection with the per-connection PRAGMAs applied (usable from any thread under db_lock)"""
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA synchronous=NORMAL;')  # Safe with WAL, no fsync per commit
+        conn.execute('PRAGMA temp_store=MEMORY;')
+        conn.execute('PRAGMA cache_size=-20000;')  # ~20 MB page cache
+        return conn
+
     def get_beer_types(self):
         """
         Fetch beer types from cloud API using the configured endpoint
         """
-        headers = {'Content-Type': 'application/json'}
         payload = {"macId": CAMERA_MAC_ID}  # Exactly as cloud team specified
         
         try:
             self.logger.info(f"Fetching beer types from: {self.beer_types_url}")
             
             # User requested POST for beer types
-            response = self.session.post(self.beer_types_url, json=payload, headers=headers, timeout=5)
+            response = self.session.post(self.beer_types_url, json=payload, timeout=(API_CONNECT_TIMEOUT, 5))
             
             self.logger.info(f"Response status: {response.status_code}")
             
@@ -92,24 +134,17 @@ class APISender:
                     data = response.json()
                     self.logger.info(f"Raw response: {data}")
                     
-                    # Handle different response formats
-                    if isinstance(data, list):
-                        # check if it is a list of dictionaries
-                        if data and isinstance(data[0], dict):
-                             # Keep full object
-                             beer_types = data
-                        else:
-                             # Convert strings to objects if needed (fallback)
-                             beer_types = [{"name": x, "id": x} for x in data]
-                    elif isinstance(data, dict):
-                        # Try different possible keys
-                        raw_list = data.get("beer_types", data.get("types", data.get("beerTypes", [])))
-                        if raw_list and isinstance(raw_list[0], dict):
-                             beer_types = raw_list
-                        else:
-                             beer_types = [{"name": x, "id": x} for x in raw_list]
-                    else:
+                    # Handle different response formats: a bare list, or a dict wrapping one
+                    if isinstance(data, dict):
+                        data = next((data[k] for k in BEER_TYPES_KEYS if k in data), [])
+                    if not isinstance(data, list):
                         beer_types = []
+                    elif data and isinstance(data[0], dict):
+                        # Keep full objects as-is
+                        beer_types = data
+                    else:
+                        # Convert bare names to objects (fallback)
+                        beer_types = [{"name": x, "id": x} for x in data]
                     
                     if beer_types and len(beer_types) > 0:
                         self.logger.info(f"Successfully fetched {len(beer_types)} beer types")
@@ -118,11 +153,11 @@ class APISender:
                         self.logger.warning(f"Endpoint returned empty beer types list")
                         
                 except json.JSONDecodeError:
-                    self.logger.warning(f"Invalid JSON response: {response.text[:100]}")
+                    self.logger.warning(f"Invalid JSON response: {_body_text(response)[:100]}")
                 except Exception as e:
                     self.logger.warning(f"Error parsing response: {e}")
             else:
-                self.logger.warning(f"Unexpected status {response.status_code}: {response.text[:200]}")
+                self.logger.warning(f"Unexpected status {response.status_code}: {_body_text(response)[:200]}")
                 
         except requests.exceptions.SSLError as e:
             self.logger.warning(f"SSL error: {e}")
@@ -164,234 +199,159 @@ class APISender:
                 "timestamp": kwargs.get('timestamp', datetime.now().isoformat())
             }
 
+        # Serialize once; the same text is stored, hashed and posted
+        serialized = json.dumps(payload, sort_keys=True, default=str)
+        
         # Store payload in database for retry capability
         try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
+            with db_lock, self._conn as conn:
                 cur = conn.cursor()
                 cur.execute('''
                     UPDATE detection_sessions 
                     SET api_payload = ?, batch_status = 'api_pending', last_api_attempt = ?
                     WHERE session_id = ?
-                ''', (json.dumps(payload, default=str), datetime.now(), batch_id))
-                conn.commit()
-                conn.close()
+                ''', (serialized, datetime.now(), batch_id))
         except Exception as e:
             self.logger.error(f"Failed to store payload: {e}")
         
         # Send with retry logic
-        success = self._send_with_retry(batch_id, payload)
+        success, last_error, response_text = self._send_with_retry(batch_id, payload, serialized=serialized)
         
-        if not success:
-            # Add to retry queue
-            self._add_to_retry_queue(batch_id, payload, "Initial send failed")
-            # Mark for attention
-            self._mark_for_attention(batch_id, "API send failure")
+        # Status, retry-queue entry and attention flag land in one transaction
+        try:
+            with db_lock, self._conn as conn:
+                self._finalize_batch(conn, batch_id, success, last_error, response_text)
+                if not success:
+                    next_retry = self._queue_retry(conn, batch_id, serialized, "Initial send failed")
+                    self._flag_attention(conn, batch_id, "API send failure")
+            if not success:
+                self._wake.set()
+                self.logger.info(f"Added {batch_id} to retry queue (next retry: {next_retry.strftime('%H:%M')})")
+                self.logger.info(f"Marked {batch_id} for attention: API send failure")
+        except Exception as e:
+            self.logger.error(f"Failed to record send result for {batch_id}: {e}")
         
         return success
 
-    def _send_with_retry(self, batch_id: str, payload: dict, start_attempt: int = 0) -> bool:
+    def _send_with_retry(self, batch_id: str, payload: dict, start_attempt: int = 0, serialized: str = None) -> tuple:
         """
-        Send request with retry logic
+        Send request with retry logic; network only, the caller records the outcome
+        (serialized: json.dumps(payload, sort_keys=True, default=str) if the caller already has it)
+        Returns (success, last_error, response_text)
         """
-        print("\n" + "="*60)
-        print("STEP 1: Starting API Send Process")
-        print("="*60)
-        print(f"  Batch ID: {batch_id}")
-        print(f"  API Endpoint: {self.api_url}")
-        print(f"  Start Attempt: {start_attempt}")
-        
         last_error = None
         
+        # Serialize once: the same canonical text is hashed and posted as the body
+        body = serialized if serialized is not None else json.dumps(payload, sort_keys=True, default=str)
+        
         # Add payload hash for integrity if enabled
-        print("\nSTEP 2: Checking payload hash configuration...")
-        print(f"  ENABLE_PAYLOAD_HASH: {ENABLE_PAYLOAD_HASH}")
         if ENABLE_PAYLOAD_HASH:
-            try:
-                data_string = json.dumps(payload, sort_keys=True)
-                payload['hash'] = hashlib.sha256(data_string.encode()).hexdigest()
-                print(f"  Hash added: {payload['hash'][:20]}...")
-                self.logger.debug(f"Added hash to payload for batch {batch_id}")
-            except Exception as e:
-                print(f"  ERROR adding hash: {e}")
-                self.logger.warning(f"Failed to add hash to payload: {e}")
-        else:
-            print("  Payload hash disabled, skipping...")
-        
-        print("\nSTEP 3: Preparing HTTP headers...")
-        headers = {'Content-Type': 'application/json'}
-        print(f"  Headers: {headers}")
-        
-        print("\nSTEP 4: Preparing payload...")
-        print(f"  Payload keys: {list(payload.keys())}")
-        print(f"  Full Payload:")
-        print(json.dumps(payload, indent=4, default=str))
+            if 'hash' in payload:
+                # Re-sent payloads from older retry rows still carry the previous hash
+                body = json.dumps({k: v for k, v in payload.items() if k != 'hash'}, sort_keys=True, default=str)
+            digest = hashlib.sha256(body.encode()).hexdigest()
+            body = f'{body[:-1]}{", " if len(body) > 2 else ""}"hash": "{digest}"}}'
+            self.logger.debug(f"Added hash to payload for batch {batch_id}")
+        body = body.encode()
         
         for attempt in range(start_attempt + 1, start_attempt + self.max_retries + 1):
-            print(f"\n{'='*60}")
-            print(f"STEP 5: Sending request (Attempt {attempt}/{start_attempt + self.max_retries})")
-            print("="*60)
-            print(f"  URL: {self.api_url}")
-            print(f"  Method: POST")
-            print(f"  Timeout: {self.timeout} seconds")
-            print(f"  SSL Verify: False")
-            
             try:
                 self.logger.info(f"Sending {batch_id} to cloud (attempt {attempt})")
                 
-                import time as _time
-                start_time = _time.time()
+                start_time = time.perf_counter()
                 
                 # Try the primary endpoint first
                 response = self.session.post(
                     self.api_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=self.timeout,
+                    data=body,
+                    timeout=(API_CONNECT_TIMEOUT, self.timeout),
                     verify=False
                 )
                 
-                elapsed = _time.time() - start_time
+                body_str = _body_text(response)
                 
-                print(f"\nSTEP 6: Response received in {elapsed:.4f} seconds")
-                print(f"  Status Code: {response.status_code}")
-                print(f"  Reason: {response.reason}")
-                print(f"  Response Headers: {dict(response.headers)}")
-                print(f"\nSTEP 7: Response Body:")
-                print("-"*40)
-                print(response.text)
-                print("-"*40)
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug(f"Batch {batch_id}: HTTP {response.status_code} in "
+                                      f"{time.perf_counter() - start_time:.3f}s: {body_str[:200]}")
                 
                 # Check response
                 if response.status_code in [200, 201]:
-                    print(f"\nSTEP 8: SUCCESS - Status {response.status_code}")
                     try:
                         resp_data = response.json()
                         pallet_id = resp_data.get('paletteId') or resp_data.get('palletId') or resp_data.get('id') or "Unknown"
-                        print(f"  Parsed JSON successfully")
-                        print(f"  Pallet ID: {pallet_id}")
                         self.logger.info(f"Batch {batch_id} sent successfully. Pallet ID: {pallet_id}")
-                    except Exception as parse_err:
-                        print(f"  Could not parse JSON: {parse_err}")
+                    except Exception:
                         self.logger.info(f"Batch {batch_id} sent successfully (Status: {response.status_code})")
                     
-                    # Update database status
-                    print("\nSTEP 9: Updating database status...")
-                    try:
-                        with db_lock:
-                            conn = sqlite3.connect(self.db_path, timeout=30)
-                            cur = conn.cursor()
-                            cur.execute('''
-                                UPDATE detection_sessions 
-                                SET batch_status = 'api_sent', 
-                                    api_response = ?,
-                                    last_api_attempt = ?
-                                WHERE session_id = ?
-                            ''', (response.text, datetime.now(), batch_id))
-                            conn.commit()
-                            conn.close()
-                        print("  Database updated successfully")
-                    except Exception as e:
-                        print(f"  ERROR updating database: {e}")
-                        self.logger.error(f"Failed to update success status: {e}")
-                    
-                    print("\n" + "="*60)
-                    print("API SEND COMPLETED SUCCESSFULLY")
-                    print("="*60 + "\n")
-                    return True
+                    return True, None, body_str
                 else:
-                    last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-                    print(f"\nSTEP 8: FAILURE - Status {response.status_code}")
-                    print(f"  Error: {last_error}")
+                    last_error = f"HTTP {response.status_code}: {body_str[:200]}"
                     self.logger.warning(f"Batch {batch_id}: {last_error} (attempt {attempt})")
                     
             except requests.exceptions.SSLError as e:
-                print(f"\nSTEP 6: SSL ERROR")
-                print(f"  Error: {e}")
                 # Try HTTP fallback if HTTPS fails
-                if self.api_url.startswith("https://"):
-                    http_url = self.api_url.replace("https://", "http://")
-                    print(f"  Trying HTTP fallback: {http_url}")
+                http_url = self._http_fallback_url
+                if http_url:
                     self.logger.info(f"SSL error, trying HTTP fallback: {http_url}")
                     try:
                         response = self.session.post(
                             http_url,
-                            json=payload,
-                            headers=headers,
-                            timeout=self.timeout
+                            data=body,
+                            timeout=(API_CONNECT_TIMEOUT, self.timeout)
                         )
                         if response.status_code in [200, 201]:
-                            print(f"  HTTP fallback SUCCESS!")
                             self.logger.info(f"Batch {batch_id} sent via HTTP fallback")
-                            return True
+                            return True, None, _body_text(response)
                     except Exception as fallback_err:
-                        print(f"  HTTP fallback failed: {fallback_err}")
+                        self.logger.warning(f"HTTP fallback failed: {fallback_err}")
                 
                 last_error = f"SSL verification failed: {str(e)}"
                 self.logger.error(f"Batch {batch_id}: {last_error} (attempt {attempt})")
             except requests.exceptions.Timeout:
                 last_error = "Request timeout"
-                print(f"\nSTEP 6: TIMEOUT ERROR")
-                print(f"  Request timed out after {self.timeout} seconds")
                 self.logger.warning(f"Batch {batch_id}: {last_error} (attempt {attempt})")
             except requests.exceptions.RequestException as e:
                 last_error = f"Network error: {str(e)}"
-                print(f"\nSTEP 6: NETWORK ERROR")
-                print(f"  Error: {e}")
                 self.logger.warning(f"Batch {batch_id}: {last_error} (attempt {attempt})")
             except Exception as e:
                 last_error = f"Unexpected error: {str(e)}"
-                print(f"\nSTEP 6: UNEXPECTED ERROR")
-                print(f"  Error: {e}")
                 self.logger.error(f"Batch {batch_id}: {last_error}")
                 break  # Don't retry on unexpected errors
             
             # Wait before retry (exponential backoff)
             if attempt < start_attempt + self.max_retries:
                 wait_time = 2 ** (attempt - start_attempt - 1)  # 1, 2, 4 seconds
-                print(f"\nWaiting {wait_time} seconds before retry...")
                 time.sleep(wait_time)
         
-        # Update error in database
-        print("\nSTEP FINAL: All retries exhausted, updating error in database...")
-        if last_error:
-            print(f"  Last Error: {last_error}")
-            try:
-                with db_lock:
-                    conn = sqlite3.connect(self.db_path, timeout=30)
-                    cur = conn.cursor()
-                    cur.execute('''
-                        UPDATE detection_sessions 
-                        SET last_error = ?, batch_status = 'api_failed',
-                            require_attention = 1, attention_reason = ?
-                        WHERE session_id = ?
-                    ''', (last_error, f"Send failure: {last_error}", batch_id))
-                    conn.commit()
-                    conn.close()
-                print("  Database updated with error status")
-            except Exception as e:
-                print(f"  ERROR updating database: {e}")
-                self.logger.error(f"Failed to update error for {batch_id}: {e}")
-        
-        print("\n" + "="*60)
-        print("API SEND FAILED")
-        print("="*60 + "\n")
-        return False
+        return False, last_error, None
+
+    def _finalize_batch(self, conn, batch_id: str, success: bool, last_error: str, response_text: str):
+        """Record a send outcome on detection_sessions (caller holds db_lock and the transaction)"""
+        if success:
+            conn.execute('''
+                UPDATE detection_sessions 
+                SET batch_status = 'api_sent', 
+                    api_response = ?,
+                    last_api_attempt = ?
+                WHERE session_id = ?
+            ''', (response_text, datetime.now(), batch_id))
+        elif last_error:
+            conn.execute('''
+                UPDATE detection_sessions 
+                SET last_error = ?, batch_status = 'api_failed',
+                    require_attention = 1, attention_reason = ?
+                WHERE session_id = ?
+            ''', (last_error, f"Send failure: {last_error}", batch_id))
 
     def _check_network_status(self):
         """Check if API server is reachable"""
         try:
-            # Check using the configured API endpoint base
-            # Ensure we use the same protocol (http/https) as the actual API
-            from urllib.parse import urlparse
-            parsed = urlparse(self.api_url)
-            base_url = f"{parsed.scheme}://{parsed.netloc}"
-            
-            # Use the base URL or the API URL itself (checking for 404/405/200)
-            test_url = base_url
+            # Check using the configured API endpoint base (same protocol as the API);
+            # any 2xx/3xx/4xx from the base URL means the server is reachable
+            test_url = self.network_check_url
             
             self.logger.debug(f"Checking network status via: {test_url}")
-            response = self.session.get(test_url, timeout=5, verify=False)
+            response = self.session.get(test_url, timeout=(API_CONNECT_TIMEOUT, 5), verify=False)
             was_online = self.network_online
             self.network_online = (response.status_code < 500)  # 2xx, 3xx, 4xx considered online
             
@@ -401,7 +361,7 @@ class APISender:
                 else:
                     self.logger.warning(f"Network: OFFLINE - Server returned {response.status_code}")
                     
-            self.last_network_check = datetime.now()
+            self.last_network_check = time.monotonic()
             return self.network_online
             
         except requests.exceptions.RequestException as e:
@@ -411,7 +371,7 @@ class APISender:
             if was_online:
                 self.logger.error(f"Network: OFFLINE - Connection error: {e}")
             
-            self.last_network_check = datetime.now()
+            self.last_network_check = time.monotonic()
             return False
 
     def start_retry_monitor(self):
@@ -431,6 +391,7 @@ class APISender:
     def stop_retry_monitor(self):
         """Stop retry monitor thread"""
         self.running = False
+        self._wake.set()
         if self.retry_thread:
             self.retry_thread.join(timeout=5)
             self.logger.info("Retry monitor stopped")
@@ -442,144 +403,166 @@ class APISender:
         while self.running:
             try:
                 # Check network every interval
-                current_time = datetime.now()
-                if (not self.last_network_check or 
-                    (current_time - self.last_network_check).seconds >= self.network_check_interval):
+                if (self.last_network_check is None or 
+                    time.monotonic() - self.last_network_check >= self.network_check_interval):
                     self._check_network_status()
                 
                 # Process retry queue if network is online
                 if self.network_online:
                     self._process_retry_queue()
                 
-                # Sleep before next check
-                time.sleep(self.retry_interval)
+                # Keep query planner statistics fresh on long-running devices
+                if time.monotonic() - self.last_optimize >= self.optimize_interval:
+                    self._optimize_db()
+                
+                # Wait until the next retry is due (at most retry_interval)
+                self._wake.wait(timeout=self._next_wake_delay())
+                self._wake.clear()
                 
             except Exception as e:
                 self.logger.error(f"Retry monitor error: {e}")
-                time.sleep(60)  # Longer sleep on error
+                self._wake.wait(timeout=60)  # Longer sleep on error
+                self._wake.clear()
+        
+        # close() gave up waiting on a send still in flight: release once its outcome is written
+        if self._closing:
+            self._release()
+
+    def _next_wake_delay(self) -> float:
+        """Seconds until the earliest pending retry, capped at retry_interval"""
+        if not self.network_online:
+            return self.retry_interval
+        with db_lock, self._conn as conn:
+            row = conn.execute('SELECT MIN(next_retry) FROM retry_queue WHERE attempts < max_attempts').fetchone()
+        if not row or not row[0]:
+            return self.retry_interval
+        delay = (datetime.fromisoformat(row[0]) - datetime.now()).total_seconds()
+        # Still overdue right after a pass means that row wasn't rescheduled; don't spin on it
+        if delay <= 0:
+            return self.retry_interval
+        return min(self.retry_interval, max(1.0, delay))
+
+    def _optimize_db(self):
+        """Run PRAGMA optimize (cheap; only re-analyzes tables that need it)"""
+        try:
+            with db_lock, self._conn as conn:
+                conn.execute('PRAGMA optimize;')
+        except Exception as e:
+            self.logger.error(f"PRAGMA optimize failed: {e}")
+        self.last_optimize = time.monotonic()
 
     def _process_retry_queue(self):
         """Process batches in retry queue"""
         try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
+            with db_lock, self._conn as conn:
                 cur = conn.cursor()
                 cur.execute('''
                     SELECT session_id, payload, attempts, error_message
                     FROM retry_queue 
                     WHERE next_retry <= ? AND attempts < max_attempts
                     ORDER BY next_retry ASC
-                    LIMIT 5
-                ''', (datetime.now(),))
+                    LIMIT ?
+                ''', (datetime.now(), self.retry_batch_size))
                 batches = cur.fetchall()
-                conn.close()
             
             if not batches:
                 return
                 
             self.logger.info(f"Processing {len(batches)} batches from retry queue")
             
+            # Collect outcomes and write them in one transaction after the sends
+            to_delete = []
+            to_update = []
+            futures = {}
+            done_q = queue.Queue()
+            outcomes = []
             for session_id, payload_json, attempts, error_msg in batches:
+                if not self.running:
+                    break  # Shutting down; unsent rows stay queued for the next start
                 try:
                     payload = json.loads(payload_json)
                     self.logger.info(f"Retrying {session_id} (attempt {attempts + 1})")
-                    
-                    success = self._send_with_retry(session_id, payload, attempts)
+                    fut = self._retry_pool.submit(self._send_with_retry, session_id, payload, attempts)
+                    futures[fut] = (session_id, attempts)
+                    # Done callbacks also fire for futures cancelled by close(), which
+                    # as_completed() would wait on forever
+                    fut.add_done_callback(done_q.put)
+                except Exception as e:
+                    self.logger.error(f"Error processing {session_id}: {e}")
+            
+            for _ in range(len(futures)):
+                fut = done_q.get()
+                if fut.cancelled():
+                    continue  # Dropped by close(); the row stays due
+                session_id, attempts = futures[fut]
+                try:
+                    success, last_error, response_text = fut.result()
+                    outcomes.append((session_id, success, last_error, response_text))
                     
                     if success:
-                        self._remove_from_retry_queue(session_id)
+                        to_delete.append((session_id,))
                     else:
-                        self._update_retry_attempts(session_id, attempts + 1)
+                        now = datetime.now()
+                        next_retry = now + timedelta(seconds=retry_backoff(attempts + 1))
+                        to_update.append((attempts + 1, next_retry, now, session_id))
                         
                 except Exception as e:
                     self.logger.error(f"Error processing {session_id}: {e}")
-                    
-        except Exception as e:
-            self.logger.error(f"Error in retry queue processing: {e}")
-
-    def _update_retry_attempts(self, session_id: str, attempts: int):
-        """Update retry attempt count"""
-        try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
-                cur = conn.cursor()
-                
-                # Calculate next retry time with exponential backoff
-                backoff_minutes = 2 ** attempts
-                next_retry = datetime.now() + timedelta(minutes=backoff_minutes)
-                
-                cur.execute('''
+            
+            with db_lock, self._conn as conn:
+                for outcome in outcomes:
+                    self._finalize_batch(conn, *outcome)
+                conn.executemany('DELETE FROM retry_queue WHERE session_id = ?', to_delete)
+                conn.executemany('''
                     UPDATE retry_queue 
                     SET attempts = ?, next_retry = ?, last_attempt = ?
                     WHERE session_id = ?
-                ''', (attempts, next_retry, datetime.now(), session_id))
-                
-                conn.commit()
-                conn.close()
-                
-        except Exception as e:
-            self.logger.error(f"Failed to update retry attempts: {e}")
-
-    def _add_to_retry_queue(self, session_id: str, payload: dict, error_msg: str = None):
-        """Add batch to retry queue"""
-        try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
-                cur = conn.cursor()
-                
-                # Get current attempt count
-                cur.execute('SELECT attempts FROM retry_queue WHERE session_id = ?', (session_id,))
-                result = cur.fetchone()
-                attempts = result[0] + 1 if result else 1
-                
-                # Calculate next retry time
-                backoff_minutes = 2 ** (attempts - 1)
-                next_retry = datetime.now() + timedelta(minutes=backoff_minutes)
-                
-                cur.execute('''
-                    INSERT OR REPLACE INTO retry_queue 
-                    (session_id, payload, last_attempt, attempts, next_retry, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (session_id, json.dumps(payload, default=str), datetime.now(), 
-                     attempts, next_retry, error_msg))
-                
-                conn.commit()
-                conn.close()
-            
-            self.logger.info(f"Added {session_id} to retry queue (next retry: {next_retry.strftime('%H:%M')})")
+                ''', to_update)
             
+            for (session_id,) in to_delete:
+                self.logger.info(f"Removed {session_id} from retry queue")
+                    
         except Exception as e:
-            self.logger.error(f"Failed to add {session_id} to retry queue: {e}")
+            self.logger.error(f"Error in retry queue processing: {e}")
+
+    def _queue_retry(self, conn, session_id: str, payload_json: str, error_msg: str = None) -> datetime:
+        """Insert or bump a retry-queue row (caller holds db_lock and the transaction); returns next_retry"""
+        cur = conn.cursor()
+        
+        # Get current attempt count
+        cur.execute('SELECT attempts FROM retry_queue WHERE session_id = ?', (session_id,))
+        result = cur.fetchone()
+        attempts = result[0] + 1 if result else 1
+        
+        # Calculate next retry time
+        backoff_seconds = retry_backoff(attempts - 1)
+        now = datetime.now()
+        next_retry = now + timedelta(seconds=backoff_seconds)
+        
+        cur.execute('''
+            INSERT OR REPLACE INTO retry_queue 
+            (session_id, payload, last_attempt, attempts, next_retry, error_message)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (session_id, payload_json, now, attempts, next_retry, error_msg))
+        return next_retry
 
     def _remove_from_retry_queue(self, session_id: str):
         """Remove batch from retry queue"""
         try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
+            with db_lock, self._conn as conn:
                 cur = conn.cursor()
                 cur.execute('DELETE FROM retry_queue WHERE session_id = ?', (session_id,))
-                conn.commit()
-                conn.close()
                 self.logger.info(f"Removed {session_id} from retry queue")
         except Exception as e:
             self.logger.error(f"Failed to remove {session_id} from retry queue: {e}")
 
-    def _mark_for_attention(self, session_id: str, reason: str):
-        """Mark batch for attention in database"""
-        try:
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
-                cur = conn.cursor()
-                cur.execute('''
-                    UPDATE detection_sessions 
-                    SET require_attention = 1, attention_reason = ?
-                    WHERE session_id = ?
-                ''', (reason, session_id))
-                conn.commit()
-                conn.close()
-                self.logger.info(f"Marked {session_id} for attention: {reason}")
-        except Exception as e:
-            self.logger.error(f"Failed to mark {session_id} for attention: {e}")
+    def _flag_attention(self, conn, session_id: str, reason: str):
+        """Set require_attention on a session (caller holds db_lock and the transaction)"""
+        conn.execute('''
+            UPDATE detection_sessions 
+            SET require_attention = 1, attention_reason = ?
+            WHERE session_id = ?
+        ''', (reason, session_id))
 
     def retry_single_batch(self, session_id: str) -> bool:
         """Manually retry a single batch"""
@@ -587,12 +570,10 @@ class APISender:
         
         try:
             # Get payload from database
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
+            with db_lock, self._conn as conn:
                 cur = conn.cursor()
                 cur.execute('SELECT api_payload FROM detection_sessions WHERE session_id = ?', (session_id,))
                 result = cur.fetchone()
-                conn.close()
             
             if not result or not result[0]:
                 self.logger.error(f"No payload found for {session_id}")
@@ -601,19 +582,18 @@ class APISender:
             payload = json.loads(result[0])
             
             # Update status
-            with db_lock:
-                conn = sqlite3.connect(self.db_path, timeout=30)
+            with db_lock, self._conn as conn:
                 cur = conn.cursor()
                 cur.execute('''
                     UPDATE detection_sessions 
                     SET batch_status = 'api_pending', last_api_attempt = ?
                     WHERE session_id = ?
                 ''', (datetime.now(), session_id))
-                conn.commit()
-                conn.close()
             
             # Send with retry
-            success = self._send_with_retry(session_id, payload)
+            success, last_error, response_text = self._send_with_retry(session_id, payload)
+            with db_lock, self._conn as conn:
+                self._finalize_batch(conn, session_id, success, last_error, response_text)
             
             if success:
                 self.logger.info(f"Manual retry successful for {session_id}")
@@ -633,6 +613,23 @@ class APISender:
 
     def close(self):
         """Clean shutdown"""
+        self._closing = True
         self.stop_retry_monitor()
-        self.session.close()
-        self.logger.info("API sender closed")
\ No newline at end of file
+        # Don't block the caller (the UI thread) on queued sends; they stay in retry_queue
+        self._retry_pool.shutdown(wait=False, cancel_futures=True)
+        if self.retry_thread and self.retry_thread.is_alive():
+            # Monitor is still waiting on an in-flight send; it releases the
+            # session and connection itself after recording the outcome
+            self.logger.info("API sender closing; retry monitor finishing in-flight sends")
+            return
+        self._release()
+        self.logger.info("API sender closed")
+
+    def _release(self):
+        """Close the HTTP session and DB connection (once, from whichever thread gets here)"""
+        with db_lock:
+            if self._conn is None:
+                return
+            self.session.close()
+            self._conn.close()
+            self._conn = None
\ No newline at end of file
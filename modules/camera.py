@@ -2,7 +2,7 @@
 import cv2
 import logging
 import numpy as np
-from config import CAMERA_CONFIG
+from config import CAMERA_CONFIG, CameraConfig
 
 log = logging.getLogger(__name__)
 
@@ -11,41 +11,43 @@ class CameraManager:
     
     def __init__(self, config=None):
         # Use provided config or default to the module-level CAMERA_CONFIG
-        self.config = config if config is not None else CAMERA_CONFIG
+        if config is None:
+            config = CAMERA_CONFIG
+        elif isinstance(config, dict):
+            config = CameraConfig(**config)
+        self.config = config
         self.cap = None
         self.is_running = False
 
     def start(self):
         """Initializes and opens the camera based on the current configuration."""
         if self.is_running and self.cap is not None:
-            self.logger.warning("Camera is already running.")
+            log.warning("Camera is already running.")
             return True
 
-        cam_type = self.config.get('type', 'v4l2').lower()
+        cfg = self.config
+        cam_type = cfg.type.lower()
 
         try:
             # 1. V4L2 (USB Webcams)
             if cam_type == 'v4l2':
-                device = self.config.get('device', 0)
+                device = cfg.device
                 self.cap = cv2.VideoCapture(device, cv2.CAP_V4L2)
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.config.get('width', 1920))
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.config.get('height', 1080))
-                self.cap.set(cv2.CAP_PROP_FPS, self.config.get('fps', 30))
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg.width)
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg.height)
+                self.cap.set(cv2.CAP_PROP_FPS, cfg.fps)
                 log.info(f"[CAMERA] Started V4L2: {device}")
 
             # 2. RTSP (IP Cameras)
             elif cam_type == 'rtsp':
-                url = self.config.get('rtsp_url') 
+                url = cfg.rtsp_url
                 self.cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG)
                 log.info(f"[CAMERA] Started RTSP: {url}")
 
             # 3. CSI (Jetson/Pi Camera Module)
             elif cam_type == 'csi':
-                # Use default values if not explicitly set in config
-                sensor_id = self.config.get('sensor_id', 0)
-                width = self.config.get('width', 1920)
-                height = self.config.get('height', 1080)
-                fps = self.config.get('fps', 30)
+                sensor_id = cfg.sensor_id
+                width, height, fps = cfg.width, cfg.height, cfg.fps
 
                 gst_pipeline = (
                     f"nvarguscamerasrc sensor-id={sensor_id} ! "
@@ -58,7 +60,7 @@ class CameraManager:
 
             # 4. File (Video testing)
             elif cam_type == 'file':
-                file_path = self.config.get('file_path', 'sample.mp4')
+                file_path = cfg.file_path
                 self.cap = cv2.VideoCapture(file_path)
                 log.info(f"[CAMERA] Started FILE: {file_path}")
 
@@ -91,7 +93,7 @@ class CameraManager:
         ret, frame = self.cap.read()
         
         # Auto-loop for video files
-        if not ret and self.config.get('type') == 'file':
+        if not ret and self.config.type == 'file':
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             return self.cap.read()
             
@@ -107,9 +109,11 @@ class CameraManager:
 
     def _create_dummy_cap(self):
         """Helper to create a fake camera object for testing."""
+        shape = (self.config.height, self.config.width, 3)
+
         class TestCap:
             def read(self): 
-                return True, np.zeros((self.config.get('height', 1080), self.config.get('width', 1920), 3), np.uint8)
+                return True, np.zeros(shape, np.uint8)
             def isOpened(self): return True
             def release(self): pass
             def set(self, prop, val): pass
@@ -4,7 +4,7 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Tuple, Optional, Dict, Any
 import threading
-from config import DB_PATH
+from config import DB_PATH, retry_backoff
 
 # Thread-safe DB access
 db_lock = threading.RLock()
@@ -15,9 +15,17 @@ class DatabaseManager:
         self._init_db()
         self._migrate_schema()
 
+    def _connect(self):
+        """Open a connection with the per-connection PRAGMAs applied"""
+        conn = sqlite3.connect(self.db_path, timeout=60)
+        conn.execute('PRAGMA synchronous=NORMAL;')  # Safe with WAL, no fsync per commit
+        conn.execute('PRAGMA temp_store=MEMORY;')
+        conn.execute('PRAGMA cache_size=-20000;')  # ~20 MB page cache
+        return conn
+
     def _init_db(self):
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('PRAGMA journal_mode=WAL;')
             cur.execute('PRAGMA foreign_keys = ON;')
@@ -142,7 +150,9 @@ class DatabaseManager:
             cur.execute('CREATE INDEX IF NOT EXISTS idx_qr_data ON decoded_data(qr_data)')
             cur.execute('CREATE INDEX IF NOT EXISTS idx_batch_status ON detection_sessions(batch_status)')
             cur.execute('CREATE INDEX IF NOT EXISTS idx_require_attention ON detection_sessions(require_attention)')
-            cur.execute('CREATE INDEX IF NOT EXISTS idx_next_retry ON retry_queue(next_retry)')
+            # Partial index: both retry pollers filter on attempts < max_attempts, so exhausted rows stay out of it
+            cur.execute('DROP INDEX IF EXISTS idx_next_retry')
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_retry_pending ON retry_queue(next_retry) WHERE attempts < max_attempts')
             cur.execute('CREATE INDEX IF NOT EXISTS idx_alerts_resolved ON system_alerts(resolved)')
             cur.execute('CREATE INDEX IF NOT EXISTS idx_alerts_type ON system_alerts(alert_type)')
             cur.execute('CREATE INDEX IF NOT EXISTS idx_keg_type ON decoded_data(keg_type)')
@@ -155,7 +165,7 @@ class DatabaseManager:
     def _migrate_schema(self):
         """Migrate existing database to new schema"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             
             # Get current columns for detection_sessions
@@ -263,7 +273,7 @@ class DatabaseManager:
 
     def _next_batch_number(self) -> int:
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('SELECT MAX(slno) FROM detection_sessions')
             mx = cur.fetchone()[0]
@@ -276,7 +286,7 @@ class DatabaseManager:
         batch_no = self._next_batch_number()
         session_id = f"BATCH_{batch_no:04d}"
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 INSERT INTO detection_sessions 
@@ -299,33 +309,10 @@ class DatabaseManager:
         print(f"[DB] STARTED {session_id} | Target: {target_keg_count} | Beer: {beer_type} | Batch: {batch} | Image: {source_image}")
         return batch_no, session_id
 
-    def _insert_global_qr(self, qr: str, source_image: str, method: str, keg_type: str = 'Unknown') -> bool:
-        with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
-            cur = conn.cursor()
-            try:
-                cur.execute('''
-                    INSERT INTO decoded_data (qr_data, source_image, detection_method, keg_type) 
-                    VALUES (?, ?, ?, ?)
-                ''', (qr, source_image, method, keg_type))
-                conn.commit()
-                conn.close()
-                return True
-            except sqlite3.IntegrityError:
-                # Update keg_type if QR already exists
-                cur.execute('''
-                    UPDATE decoded_data 
-                    SET keg_type = COALESCE(?, keg_type)
-                    WHERE qr_data = ? AND (keg_type IS NULL OR keg_type = 'Unknown')
-                ''', (keg_type, qr))
-                conn.commit()
-                conn.close()
-                return False
-
     def store_registered_keg(self, qr_data: str, keg_type: str):
         """Store or update keg type for a QR code"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 INSERT OR REPLACE INTO decoded_data (qr_data, keg_type) 
@@ -337,7 +324,7 @@ class DatabaseManager:
     def get_keg_type(self, qr_data: str) -> str:
         """Get keg type for a QR code"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute("SELECT keg_type FROM decoded_data WHERE qr_data = ?", (qr_data,))
             row = cur.fetchone()
@@ -352,20 +339,28 @@ class DatabaseManager:
         
         unique_data = list({(q.strip(), k) for q, k in zip(qr_list, keg_types) if q.strip()})
         unique_qrs = [d[0] for d in unique_data]
-        unique_types = [d[1] for d in unique_data]
         
-        new_global = sum(self._insert_global_qr(q, session_id, method, k) 
-                         for q, k in zip(unique_qrs, unique_types))
-
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
-            cur = conn.cursor()
-            cur.execute('''
-                UPDATE detection_sessions 
-                SET qr_list = ?, decodedqrcodes = ?, totaldetection = ?, batch_status = 'processing'
-                WHERE session_id = ?
-            ''', (json.dumps(unique_qrs), len(unique_qrs), total_detections, session_id))
-            conn.commit()
+            conn = self._connect()
+            # One transaction for the whole pallet instead of a commit per QR
+            with conn:
+                cur = conn.cursor()
+                cur.executemany('''
+                    INSERT OR IGNORE INTO decoded_data (qr_data, source_image, detection_method, keg_type) 
+                    VALUES (?, ?, ?, ?)
+                ''', [(q, session_id, method, k) for q, k in unique_data])
+                new_global = cur.rowcount
+                # Fill in keg_type for QRs that were already known as 'Unknown'
+                cur.executemany('''
+                    UPDATE decoded_data 
+                    SET keg_type = COALESCE(?, keg_type)
+                    WHERE qr_data = ? AND (keg_type IS NULL OR keg_type = 'Unknown')
+                ''', [(k, q) for q, k in unique_data])
+                cur.execute('''
+                    UPDATE detection_sessions 
+                    SET qr_list = ?, decodedqrcodes = ?, totaldetection = ?, batch_status = 'processing'
+                    WHERE session_id = ?
+                ''', (json.dumps(unique_qrs), len(unique_qrs), total_detections, session_id))
             conn.close()
         
         print(f"[DB] {session_id} → {len(unique_qrs)} QR(s) stored ({new_global} new)")
@@ -375,7 +370,7 @@ class DatabaseManager:
                           require_attention: bool = False, attention_reason: str = None):
         """Update batch status with detailed tracking"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             
             update_fields = ['batch_status = ?']
@@ -420,7 +415,7 @@ class DatabaseManager:
     def store_api_payload(self, session_id: str, payload: dict):
         """Store API payload for retry capability"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 UPDATE detection_sessions 
@@ -437,7 +432,7 @@ class DatabaseManager:
         status = "success" if api_success else "failed" if api_success is not None else "pending"
         
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 UPDATE detection_sessions 
@@ -453,7 +448,7 @@ class DatabaseManager:
     def get_batch_status(self, session_id: str) -> str:
         """Get batch status for a session"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute("SELECT batch_status FROM detection_sessions WHERE session_id = ?", (session_id,))
             row = cur.fetchone()
@@ -463,7 +458,7 @@ class DatabaseManager:
     def get_batch_response(self, session_id: str) -> str:
         """Get API response for a session"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute("SELECT api_response FROM detection_sessions WHERE session_id = ?", (session_id,))
             row = cur.fetchone()
@@ -473,7 +468,7 @@ class DatabaseManager:
     def get_decoded_count(self, session_id: str) -> int:
         """Get number of decoded QR codes for a session"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute("SELECT decodedqrcodes FROM detection_sessions WHERE session_id = ?", (session_id,))
             row = cur.fetchone()
@@ -483,7 +478,7 @@ class DatabaseManager:
     def mark_for_attention(self, session_id: str, reason: str):
         """Mark a batch as requiring attention"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 UPDATE detection_sessions 
@@ -496,7 +491,7 @@ class DatabaseManager:
     def resolve_attention(self, session_id: str):
         """Mark a batch as no longer requiring attention"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 UPDATE detection_sessions 
@@ -509,7 +504,7 @@ class DatabaseManager:
     def get_batches_requiring_attention(self) -> List[Dict[str, Any]]:
         """Get all batches that need operator attention"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 SELECT session_id, batch_status, last_error, decodedqrcodes, 
@@ -544,7 +539,7 @@ class DatabaseManager:
     def get_attention_batches(self) -> List[Dict[str, Any]]:
         """Get batches requiring attention (simplified format)"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 SELECT session_id, batch_status, attention_reason, decodedqrcodes, target_keg_count 
@@ -566,7 +561,7 @@ class DatabaseManager:
     def get_attention_count(self) -> int:
         """Count batches needing attention"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('SELECT COUNT(*) FROM detection_sessions WHERE require_attention = 1')
             count = cur.fetchone()[0]
@@ -576,7 +571,7 @@ class DatabaseManager:
     def add_to_retry_queue(self, session_id: str, payload: dict, error_msg: str = None):
         """Add batch to retry queue with exponential backoff"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             
             # Get current attempt count
@@ -584,9 +579,9 @@ class DatabaseManager:
             result = cur.fetchone()
             attempts = result[0] + 1 if result else 1
             
-            # Calculate next retry time (exponential backoff)
-            backoff_minutes = 2 ** (attempts - 1)  # 1, 2, 4, 8 minutes
-            next_retry = datetime.now() + timedelta(minutes=backoff_minutes)
+            # Calculate next retry time (exponential backoff: 1, 2, 4, 8, 16 minutes)
+            backoff_seconds = retry_backoff(attempts - 1)
+            next_retry = datetime.now() + timedelta(seconds=backoff_seconds)
             
             cur.execute('''
                 INSERT OR REPLACE INTO retry_queue 
@@ -600,7 +595,7 @@ class DatabaseManager:
     def get_retry_queue(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get batches ready for retry"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 SELECT session_id, payload, attempts, next_retry, error_message
@@ -632,7 +627,7 @@ class DatabaseManager:
     def remove_from_retry_queue(self, session_id: str):
         """Remove batch from retry queue after successful send"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('DELETE FROM retry_queue WHERE session_id = ?', (session_id,))
             conn.commit()
@@ -641,7 +636,7 @@ class DatabaseManager:
     def mark_batch_resolved(self, session_id: str, reason: str = "Manually resolved"):
         """Mark batch as resolved (no longer requires attention)"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 UPDATE detection_sessions 
@@ -652,25 +647,30 @@ class DatabaseManager:
             conn.close()
 
     def get_stuck_batches(self, timeout_minutes: int = 10) -> List[str]:
-        """Find batches stuck in processing state"""
+        """Find batches stuck in processing state (empty list on DB errors)"""
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
-            cur = conn.cursor()
-            timeout_time = datetime.now() - timedelta(minutes=timeout_minutes)
-            cur.execute('''
-                SELECT session_id 
-                FROM detection_sessions 
-                WHERE batch_status IN ('processing', 'api_pending')
-                AND session_timestamp < ?
-            ''', (timeout_time,))
-            results = cur.fetchall()
-            conn.close()
+            conn = self._connect()
+            try:
+                cur = conn.cursor()
+                timeout_time = datetime.now() - timedelta(minutes=timeout_minutes)
+                cur.execute('''
+                    SELECT session_id 
+                    FROM detection_sessions 
+                    WHERE batch_status IN ('processing', 'api_pending')
+                    AND session_timestamp < ?
+                ''', (timeout_time,))
+                results = cur.fetchall()
+            except sqlite3.Error as e:
+                print(f"[DB] Error finding stuck batches: {e}")
+                return []
+            finally:
+                conn.close()
         
         return [row[0] for row in results]
 
     def get_session_data(self, session_id: str) -> Tuple[List[str], Optional[datetime]]:
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             try:
                 cur.execute("SELECT qr_list, session_timestamp FROM detection_sessions WHERE session_id = ?", (session_id,))
@@ -693,7 +693,7 @@ class DatabaseManager:
             return False, ""
         fingerprint = json.dumps(tuple(sorted(qr_codes)))
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute("SELECT batch_id FROM processed_pallets WHERE fingerprint = ?", (fingerprint,))
             row = cur.fetchone()
@@ -705,7 +705,7 @@ class DatabaseManager:
             return
         fingerprint = json.dumps(tuple(sorted(qr_codes)))
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             try:
                 cur.execute("INSERT INTO processed_pallets (fingerprint, batch_id) VALUES (?, ?)",
@@ -720,7 +720,7 @@ class DatabaseManager:
         """Check if pallet with same QR codes already exists"""
         fingerprint = json.dumps(tuple(sorted(qr_codes)))
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 SELECT pallet_id, status FROM pallet_lifecycle 
@@ -736,7 +736,7 @@ class DatabaseManager:
         fingerprint = json.dumps(tuple(sorted(qr_codes)))
         
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 INSERT INTO pallet_lifecycle 
@@ -751,7 +751,7 @@ class DatabaseManager:
 
     def print_summary(self):
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('SELECT COUNT(*) FROM detection_sessions'); batches = cur.fetchone()[0]
             cur.execute('SELECT COUNT(*) FROM decoded_data'); unique_qr = cur.fetchone()[0]
@@ -791,7 +791,7 @@ class DatabaseManager:
             return False, None
         
         with db_lock:
-            conn = sqlite3.connect(self.db_path, timeout=60)
+            conn = self._connect()
             cur = conn.cursor()
             cur.execute('''
                 SELECT session_id FROM detection_sessions 
@@ -6,6 +6,7 @@ from ultralytics import YOLO
 from pyzbar.pyzbar import decode, ZBarSymbol
 from qreader import QReader
 from config import KEG_MODEL_PATH, QR_MODEL_PATH, KEG_CONF_THRESHOLD, QR_CONF_THRESHOLD
+from .fast_preproc import region_has_texture
 
 device = 0 if torch.cuda.is_available() else 'cpu'
 use_half = torch.cuda.is_available()  # FP16 for speed on GPU
@@ -90,11 +91,14 @@ class QRDetector(BaseDetector):
         scale = max_size / max(h, w)
         return cv2.resize(crop, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
 
-    def detect_and_decode(self, frame):
+    def detect_and_decode(self, frame, gray=None, mask=None):
         """
         1. Detects QR bounding box using YOLO.
         2. Crops and tries QReader (AI).
         3. Fallback to Pyzbar (Standard).
+
+        gray/mask come from fast_preproc.preprocess: a precomputed gray frame
+        avoids per-crop color conversion, and boxes over flat tiles are skipped.
         """
         # 1. Detect QR location
         results = self.model.predict(
@@ -121,19 +125,22 @@ class QRDetector(BaseDetector):
                 x1, y1 = max(0, x1), max(0, y1)
                 x2, y2 = min(w, x2), min(h, y2)
 
-                crop = frame[y1:y2, x1:x2]
-                if crop.size == 0: continue
+                if x2 <= x1 or y2 <= y1: continue
 
-                # Optimization: Resize heavy crops
-                crop_opt = self._resize_crop(crop)
-                
-                # Preprocess for barcode readers
-                gray = cv2.cvtColor(crop_opt, cv2.COLOR_BGR2GRAY)
+                # Skip boxes over regions with no QR-like texture
+                if mask is not None and not region_has_texture(mask, (x1, y1, x2, y2)):
+                    continue
+
+                # Preprocess for barcode readers (resize heavy crops)
+                if gray is not None:
+                    gray_crop = self._resize_crop(gray[y1:y2, x1:x2])
+                else:
+                    gray_crop = cv2.cvtColor(self._resize_crop(frame[y1:y2, x1:x2]), cv2.COLOR_BGR2GRAY)
 
                 current_text = None
 
                 try:
-                    qreader_texts = self.reader.detect_and_decode(image=gray)
+                    qreader_texts = self.reader.detect_and_decode(image=gray_crop)
                     for text in qreader_texts:
                         if text:
                             current_text = text
@@ -143,7 +150,7 @@ class QRDetector(BaseDetector):
 
                 if not current_text:
                     try:
-                        pyzbar_res = decode(gray, symbols=[ZBarSymbol.QRCODE])
+                        pyzbar_res = decode(gray_crop, symbols=[ZBarSymbol.QRCODE])
                         for obj in pyzbar_res:
                             text = obj.data.decode("utf-8")
                             if text:
@@ -184,10 +191,9 @@ def detect_qr_standard(frame):
 
 
 def detect_qr_advanced(image_path):
-    """Wrapper for advanced detection - Uses standalone AdvancedQRDetector."""
-    from .advanced import AdvancedQRDetector  
-    detector = AdvancedQRDetector()  
-    return detector.detect_advanced(image_path)  
+    """Wrapper for advanced detection - Uses the shared AdvancedQRDetector."""
+    from .advanced import run_advanced_detection
+    return run_advanced_detection(image_path)
 
 
 def detect_composition(frame):
@@ -0,0 +1,40 @@
+# modules/fast_preproc.py
+import cv2
+import numpy as np
+
+PREPROC_TILE = 32
+PREPROC_DOWNSCALE = 2  # Tile stats are taken on a 1/2-resolution gray frame
+MIN_TILE_VARIANCE = 100.0  # Flat tiles (no QR texture) fall below this
+
+
+def preprocess(frame, tile=PREPROC_TILE, min_variance=MIN_TILE_VARIANCE):
+    """
+    Converts a BGR frame to gray once and builds a per-tile texture mask.
+    mask[r, c] == 1 means the tile has enough contrast to hold a QR code.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    rows, cols = h // tile, w // tile
+    if rows == 0 or cols == 0:
+        return gray, np.ones((1, 1), dtype=np.uint8)
+
+    # Stats on a downscaled uint8 view; only that small image is promoted to float
+    step = tile // PREPROC_DOWNSCALE
+    small = cv2.resize(gray, (w // PREPROC_DOWNSCALE, h // PREPROC_DOWNSCALE), interpolation=cv2.INTER_AREA)
+
+    # INTER_AREA with an integer factor is an exact block mean: E[x] and E[x^2] per tile
+    small = small[:rows * step, :cols * step].astype(np.float32)
+    mean = cv2.resize(small, (cols, rows), interpolation=cv2.INTER_AREA)
+    mean_sq = cv2.resize(cv2.multiply(small, small), (cols, rows), interpolation=cv2.INTER_AREA)
+    mask = (mean_sq - mean * mean >= min_variance).astype(np.uint8)
+    return gray, mask
+
+
+def region_has_texture(mask, bbox, tile=PREPROC_TILE):
+    """True if any tile overlapping bbox (x1, y1, x2, y2) is textured."""
+    x1, y1, x2, y2 = bbox
+    rows, cols = mask.shape
+    # Clamp so boxes in the partial edge strip still map to the last tile
+    r0, c0 = min(y1 // tile, rows - 1), min(x1 // tile, cols - 1)
+    r1, c1 = max(-(-y2 // tile), r0 + 1), max(-(-x2 // tile), c0 + 1)
+    return bool(mask[r0:r1, c0:c1].any())
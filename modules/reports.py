@@ -10,7 +10,7 @@ from config import DB_PATH, LOGS_DIR
 class ReportGenerator:
     def __init__(self):
         self.db_path = str(DB_PATH)
-        self.reports_dir = LOGS_DIR / "reports"
+        self.reports_dir = Path(LOGS_DIR) / "reports"
         self.reports_dir.mkdir(exist_ok=True)
     
     def generate_daily_report(self, date=None, output_format='json'):
@@ -1,13 +1,21 @@
 # modules/utils.py
 # Full corrected file with new persistence function added at the end.
 
+import json
 import logging
+import mmap
 import os
 import shutil
 import time
-from datetime import datetime
 import re 
+import zlib
 from pathlib import Path  
+from config import CLOUD_CONFIG_CACHE_FILE, BATCH_MEMORY_FILE
+
+# Batch memory layout: 60 bytes of NUL-padded UTF-8 text + 4-byte CRC32
+_BATCH_MEMORY_SIZE = 64
+_BATCH_TEXT_SIZE = 60
+_batch_mmap = None
 
 def setup_logging(log_level=logging.INFO, log_file=None):
     """Setup logging configuration"""
@@ -66,9 +74,20 @@ def manage_storage(folder_path, max_size_mb):
     except Exception as e:
         logging.error(f"Storage management failed: {e}")
 
+# fmt -> (epoch second, formatted string); formatting happens once per second per fmt
+_FMT_CACHE = {}
+
+def fmt_now(fmt='%d-%m-%Y %H:%M'):
+    """Format the current local time, reusing the result within the same second"""
+    now = int(time.time())
+    cached = _FMT_CACHE.get(fmt)
+    if cached is None or cached[0] != now:
+        cached = _FMT_CACHE[fmt] = (now, time.strftime(fmt, time.localtime(now)))
+    return cached[1]
+
 def create_timestamp():
     """Create standardized timestamp"""
-    return datetime.now().strftime('%Y%m%d_%H%M%S')
+    return fmt_now('%Y%m%d_%H%M%S')
 
 def ensure_directory(directory_path):
     """Ensure directory exists"""
@@ -118,17 +137,29 @@ def save_default_keg_count(value: int):
     logging.info(f"Config updated: DEFAULT_KEG_COUNT = {value}")
     return True
 
-# Add these functions to utils.py
+def _get_batch_mmap():
+    """Map the batch memory file once per process, sizing it on first use"""
+    global _batch_mmap
+    if _batch_mmap is None:
+        fd = os.open(BATCH_MEMORY_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != _BATCH_MEMORY_SIZE:
+                os.ftruncate(fd, _BATCH_MEMORY_SIZE)
+            _batch_mmap = mmap.mmap(fd, _BATCH_MEMORY_SIZE)
+        finally:
+            os.close(fd)
+    return _batch_mmap
+
 def save_last_batch(batch_number: str):
-    """Save the last batch number to file"""
+    """Save the last batch number to the mapped batch memory file"""
     try:
-        config_path = Path(__file__).parent.parent / "config.py"
-        config_dir = config_path.parent
+        data = batch_number.encode('utf-8')
+        if len(data) > _BATCH_TEXT_SIZE:
+            raise ValueError(f"batch number longer than {_BATCH_TEXT_SIZE} bytes")
         
-        # Create batch memory file
-        batch_file = config_dir / "last_batch.txt"
-        with open(batch_file, 'w', encoding='utf-8') as f:
-            f.write(batch_number)
+        mm = _get_batch_mmap()
+        mm[:] = data.ljust(_BATCH_TEXT_SIZE, b'\0') + zlib.crc32(data).to_bytes(4, 'little')
+        mm.flush()
         
         logging.info(f"Saved last batch: {batch_number}")
         return True
@@ -137,20 +168,62 @@ def save_last_batch(batch_number: str):
         return False
 
 def load_last_batch() -> str:
-    """Load the last batch number from file"""
+    """Load the last batch number from the mapped batch memory file"""
     try:
-        config_path = Path(__file__).parent.parent / "config.py"
-        config_dir = config_path.parent
-        batch_file = config_dir / "last_batch.txt"
+        mm = _get_batch_mmap()
+        data = mm[:_BATCH_TEXT_SIZE].split(b'\0', 1)[0].strip()
+        crc = mm[_BATCH_TEXT_SIZE:_BATCH_MEMORY_SIZE]
+        
+        # An all-zero CRC is a legacy plain-text file padded on first map
+        if crc != b'\0\0\0\0' and int.from_bytes(crc, 'little') != zlib.crc32(data):
+            logging.warning("Batch memory checksum mismatch, using default")
+            data = b''
         
-        if batch_file.exists():
-            with open(batch_file, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
-                if content:
-                    return content
+        if data:
+            return data.decode('utf-8')
         
         # Return default if file doesn't exist or is empty
         return "BATCH-001"
     except Exception as e:
         logging.error(f"Failed to load last batch: {e}")
-        return "BATCH-001"
\ No newline at end of file
+        return "BATCH-001"
+
+def save_cloud_config(data: dict):
+    """Persist the last good cloud config response"""
+    try:
+        with open(CLOUD_CONFIG_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        return True
+    except Exception as e:
+        logging.error(f"Failed to save cloud config cache: {e}")
+        return False
+
+def load_cloud_config():
+    """Load the cached cloud config and its age in seconds, or (None, None)"""
+    try:
+        age = time.time() - os.path.getmtime(CLOUD_CONFIG_CACHE_FILE)
+        with open(CLOUD_CONFIG_CACHE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f), age
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        logging.error(f"Failed to load cloud config cache: {e}")
+        return None, None
+
+def plan_cpu_affinity():
+    """Split usable cores into (ui, detector, background) sets, or None if not possible"""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < 3:
+        return None
+    return {cores[0]}, {cores[1]}, set(cores[2:])
+
+def pin_current_thread(cores):
+    """Pin the calling thread to the given cores (no-op for None)"""
+    if not cores:
+        return
+    try:
+        os.sched_setaffinity(0, cores)
+    except OSError as e:
+        logging.warning(f"Failed to set CPU affinity {sorted(cores)}: {e}")